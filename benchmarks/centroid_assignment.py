@@ -0,0 +1,84 @@
+# benchmarks/centroid_assignment.py
+import argparse
+import json
+import time
+import numpy as np
+from vision_track.lib.trackers.centroid import CentroidTracker
+
+
+def make_sequence(n_objects, n_frames, speed, area, seed):
+    """Random walks of n_objects points, returns an (n_frames, n_objects, 2) array"""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0, area, size=(n_objects, 2))
+    steps = rng.normal(0, speed, size=(n_frames, n_objects, 2))
+    steps[0] = 0
+    return start + np.cumsum(steps, axis=0)
+
+
+def run(n_objects, n_frames, max_distance, assignment, seed=0):
+    # Density is kept constant so that the number of neighbours per object
+    # does not change with n_objects
+    area = np.sqrt(n_objects) * 100
+    positions = make_sequence(n_objects, n_frames, speed=5.0, area=area, seed=seed)
+
+    tracker = CentroidTracker(max_distance=max_distance, assignment=assignment)
+    tracker.update_centroids(positions[0].astype(int))
+    ids_by_input = np.array(list(tracker.objects.keys()))
+    start_centroids = positions[0].astype(int)
+
+    latencies = []
+    correct = 0
+    for frame in positions[1:]:
+        centroids = frame.astype(int)
+        start = time.perf_counter()
+        tracker.update_centroids(centroids)
+        latencies.append(time.perf_counter() - start)
+
+        # An object keeps its identity if its id now sits on its own centroid
+        current = {tuple(c): object_id for object_id, c in tracker.objects.items()}
+        correct += sum(
+            current.get(tuple(c)) == object_id for c, object_id in zip(centroids, ids_by_input)
+        )
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "objects": n_objects,
+        "assignment": assignment,
+        "max_distance": max_distance,
+        "mean_ms": float(latencies.mean()),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "id_accuracy": correct / (n_objects * (n_frames - 1)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CentroidTracker assignment scaling benchmark")
+    parser.add_argument("--objects", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--max-distance", type=float, default=50.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    configurations = [
+        (CentroidTracker.GREEDY, None),
+        (CentroidTracker.GREEDY, args.max_distance),
+        (CentroidTracker.OPTIMAL, args.max_distance),
+    ]
+    results = []
+    for n_objects in args.objects:
+        for assignment, max_distance in configurations:
+            results.append(run(n_objects, args.frames, max_distance, assignment))
+            if not args.json:
+                r = results[-1]
+                gate = "none" if max_distance is None else f"{max_distance:g}"
+                print(
+                    f"{n_objects:6d} objects  {assignment:8s} gate {gate:5s}  "
+                    f"mean {r['mean_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+                    f"id accuracy {r['id_accuracy']:.3f}"
+                )
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/tracker_suite.py
+import argparse
+import contextlib
+import json
+import sys
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from synthetic import SyntheticSequence
+from vision_track.lib.data_io.frame import Frame
+from vision_track.lib.trackers import available_trackers, get_tracker
+from vision_track.lib.trackers.sort import iou_matrix
+
+# Objects less visible than this are not expected to be tracked in a frame
+MIN_VISIBILITY = 0.5
+MIN_IOU = 0.1
+
+
+def match(predicted, truth, points=False):
+    """Match predicted (id, box) pairs to ground truth boxes, returns a list of
+    (truth index, predicted id, IoU). With points=True only the predicted box
+    centres are used (IoU is None); a centre matches a box it lies in."""
+    if not predicted or len(truth) == 0:
+        return []
+    ids = list(predicted)
+    boxes = np.array([predicted[i] for i in ids], dtype=float)
+    if points:
+        centres = boxes[:, :2] + boxes[:, 2:] / 2
+        inside = (
+            (centres[None, :, 0] >= truth[:, None, 0])
+            & (centres[None, :, 0] <= truth[:, None, 0] + truth[:, None, 2])
+            & (centres[None, :, 1] >= truth[:, None, 1])
+            & (centres[None, :, 1] <= truth[:, None, 1] + truth[:, None, 3])
+        )
+        truth_centres = truth[:, :2] + truth[:, 2:] / 2
+        distance = np.linalg.norm(truth_centres[:, None] - centres[None], axis=2)
+        rows, cols = linear_sum_assignment(np.where(inside, distance, 1e9))
+        return [(r, ids[c], None) for r, c in zip(rows, cols) if inside[r, c]]
+
+    iou = iou_matrix(truth, boxes)
+    rows, cols = linear_sum_assignment(-iou)
+    return [(r, ids[c], iou[r, c]) for r, c in zip(rows, cols) if iou[r, c] >= MIN_IOU]
+
+
+def run_tracker(name, sequence, options=None):
+    tracker = get_tracker(name)(**(options or {}))
+    frames = iter(sequence)
+    image, boxes, visibility = next(frames)
+
+    # Detection-driven trackers are fed the ground truth of the visible objects
+    if hasattr(tracker, "update_detections"):
+        mode = "detections"
+    elif hasattr(tracker, "update_centroids"):
+        mode = "centroids"
+    else:
+        mode = "frames"
+
+    if mode == "frames":
+        tracker.initialize(Frame(image), [tuple(box) for box in np.round(boxes).astype(int)])
+    latencies, ious = [], []
+    expected = found = id_switches = 0
+    assigned = {}  # ground truth index -> predicted id it was last matched to
+
+    for image, boxes, visibility in frames if mode == "frames" else sequence:
+        visible = visibility >= MIN_VISIBILITY
+        frame = Frame(image)
+        start = time.perf_counter()
+        if mode == "detections":
+            predicted = tracker.update_detections(boxes[visible])
+        elif mode == "centroids":
+            centres = boxes[visible, :2] + boxes[visible, 2:] / 2
+            predicted = {
+                object_id: (x, y, 0, 0)
+                for object_id, (x, y) in tracker.update_centroids(centres).items()
+            }
+        else:
+            predicted = tracker.update(frame)
+        latencies.append(time.perf_counter() - start)
+        frame.release()
+
+        truth_index = np.flatnonzero(visible)
+        expected += len(truth_index)
+        for row, object_id, iou in match(predicted, boxes[visible], points=mode == "centroids"):
+            index = truth_index[row]
+            found += 1
+            if iou is not None:
+                ious.append(iou)
+            if index in assigned and assigned[index] != object_id:
+                id_switches += 1
+            assigned[index] = object_id
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "tracker": name,
+        "mode": mode,
+        "frames": len(latencies),
+        "fps": float(len(latencies) / (latencies.sum() / 1000)) if latencies.sum() else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "recall": found / expected if expected else None,
+        "id_switches": id_switches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracker benchmark on synthetic sequences")
+    parser.add_argument("--trackers", nargs="+", default=None, help="Default: all trackers")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--objects", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--object-size", type=int, default=60)
+    parser.add_argument("--speed", type=float, default=3.0)
+    parser.add_argument("--scale-change", type=float, default=0.2)
+    parser.add_argument("--occluders", type=int, default=1)
+    parser.add_argument("--noise", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--options", type=json.loads, default={},
+        help='JSON dict of tracker options by tracker name, e.g. \'{"CascadeTracker": {"fast": "KCF"}}\'',
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    sequence = SyntheticSequence(
+        width=args.width,
+        height=args.height,
+        n_objects=args.objects,
+        n_frames=args.frames,
+        object_size=args.object_size,
+        speed=args.speed,
+        scale_change=args.scale_change,
+        occluders=args.occluders,
+        noise=args.noise,
+        seed=args.seed,
+    )
+
+    results = []
+    for name in args.trackers or available_trackers():
+        try:
+            # Trackers print progress, keep stdout for the results
+            with contextlib.redirect_stdout(sys.stderr):
+                result = run_tracker(name, sequence, args.options.get(name))
+        except Exception as e:
+            result = {"tracker": name, "error": str(e)}
+        results.append(result)
+        if not args.json:
+            if "error" in result:
+                print(f"{name:20s} error: {result['error']}", file=sys.stderr)
+                continue
+            iou = "-" if result["mean_iou"] is None else f"{result['mean_iou']:.3f}"
+            print(
+                f"{name:20s} {result['fps']:8.1f} FPS  p50 {result['p50_ms']:7.2f} ms  "
+                f"p99 {result['p99_ms']:7.2f} ms  IoU {iou:5s}  "
+                f"recall {result['recall']:.3f}  ID switches {result['id_switches']}"
+            )
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("json", "output")}
+    report = {"sequence": settings, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
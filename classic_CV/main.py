@@ -2,24 +2,46 @@ import argparse
 import json
 import cv2
 import logging
-import io
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from data_io.handlers import InputHandler, OutputHandler
-# from data_io.data_format import DataFormat
+from data_io.handlers import InputHandler, create_output_handler, tracked_annotations
+from data_io.data_format import DataFormat
+from data_io.frame import Frame
 from trackers import get_tracker
+from profiling import StageProfiler
 
 
-class StringIOHandler(logging.Handler):
+class StreamingLogHandler(logging.Handler):
+    """Writes the log to a temporary file as records are emitted, so long runs
+    do not keep their log in memory"""
+
     def __init__(self):
         logging.Handler.__init__(self)
-        self.stream = io.StringIO()
+        self.stream = tempfile.TemporaryFile("w+", encoding="utf-8")
 
     def emit(self, record):
         msg = self.format(record)
         self.stream.write(f"{msg}\n")
+        self.stream.flush()
+
+    def read_since(self, position=0):
+        """Log text written since position (0 or a position returned before),
+        and the position of its end"""
+        self.acquire()
+        try:
+            end = self.stream.tell()
+            self.stream.seek(position)
+            text = self.stream.read()
+            self.stream.seek(end)
+            return text, end
+        finally:
+            self.release()
 
     def get_contents(self):
-        return self.stream.getvalue()
+        return self.read_since(0)[0]
 
 
 def setup_logging():
@@ -30,11 +52,11 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
     logger.addHandler(console_handler)
 
-    string_handler = StringIOHandler()
-    string_handler.setLevel(logging.INFO)
-    logger.addHandler(string_handler)
+    file_handler = StreamingLogHandler()
+    file_handler.setLevel(logging.INFO)
+    logger.addHandler(file_handler)
 
-    return string_handler
+    return file_handler
 
 
 def parse_arguments():
@@ -45,77 +67,309 @@ def parse_arguments():
         "--output",
         nargs="?",
         const="",
-        help="Output file name (use '-' to disable saving, omit for default datetime name)",
+        help="Output file name (use '-' to disable saving, omit for default datetime name). "
+        "When the input source is a directory of archives this is the output directory.",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes when re-tracking a directory of archives "
+        "(default: number of CPUs)",
     )
     return parser.parse_args()
 
 
 def load_config(config_path):
     with open(config_path, "r") as f:
-        return json.load(f)
+        config = json.load(f)
+    # Boxes files are read once here, relative to the config file
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    for entry in [config] + config.get("streams", []):
+        if "initial_boxes_file" in entry:
+            path = os.path.join(base_dir, entry.pop("initial_boxes_file"))
+            entry["initial_boxes"] = load_initial_boxes(path)
+    return config
+
+
+def load_initial_boxes(path):
+    """Read [x, y, w, h] boxes from a JSON file holding a list of boxes, a single
+    box or the metadata.json of a recording (its "roi")"""
+    with open(path, "r") as f:
+        boxes = json.load(f)
+    if isinstance(boxes, dict):
+        boxes = boxes["roi"]
+    if len(boxes) == 4 and all(isinstance(v, (int, float)) for v in boxes):
+        boxes = [boxes]
+    return [tuple(box) for box in boxes]
+
+
+def create_tracker(config):
+    tracker_name = config.get("tracking_algorithm", "CSRTTracker")
+    TrackerClass = get_tracker(tracker_name)
+    return tracker_name, TrackerClass(**config.get("tracker_options", {}))
 
 
 def process_live_camera(config, output_handler):
+    """Track a camera or video file, recording to output_handler. Returns False
+    if tracking could not be started, in which case nothing was recorded."""
     input_source = config.get("input_source", 0)
-    input_handler = InputHandler(input_source)
-    input_handler.warm_up(2)
+    input_handler = InputHandler(
+        input_source,
+        threaded=config.get("threaded_capture", False),
+        queue_size=config.get("capture_queue_size", 4),
+        drop_policy=config.get("capture_drop_policy", InputHandler.DROP_LATEST),
+    )
+    input_handler.warm_up(config.get("warm_up", 2))
 
     frame, _ = input_handler.fetch_frame()
 
-    tracker_name = config.get("tracking_algorithm", "CSRTTracker")
-    TrackerClass = get_tracker(tracker_name)
-    tracker = TrackerClass()
+    tracker_name, tracker = create_tracker(config)
 
     logging.info(f"Using tracker: {tracker_name}")
 
-    bbox = tracker.select_ROI(frame)
+    # Headless runs never open a window, the boxes must come from the config
+    headless = config.get("headless", False)
+    preview_file = config.get("preview_file")
+    if headless:
+        preview_every = config.get("preview_every", 30 if preview_file else 0)
+    else:
+        preview_every = config.get("preview_every", 1)
+    boxes = config.get("initial_boxes")
+    if boxes is None:
+        if headless:
+            logging.error("Headless mode needs initial_boxes or initial_boxes_file. Exiting.")
+            input_handler.release()
+            tracker.close()
+            return False
+        boxes = [tracker.select_ROI(frame)]
 
     if output_handler:
-        output_handler.set_roi(frame, bbox)
+        output_handler.set_roi(frame, boxes[0] if len(boxes) == 1 else boxes)
 
-    if tracker.initialize(frame, [bbox]):
+    if tracker.initialize(frame, boxes):
         logging.info("Tracking initialized. Starting main loop...")
 
+        profiler = StageProfiler(["capture", "track", "overlay", "display", "record"])
+        frame_number = 0
         try:
             while True:
-                frame, ret = input_handler.fetch_frame()
+                profiler.start_frame()
+                image, ret = input_handler.fetch_frame()
                 if not ret:
                     logging.info("End of video feed or error fetching frame.")
                     break
+                frame = Frame(image, frame_number, input_handler.last_timestamp)
+                profiler.mark("capture")
 
                 tracked = tracker.update(frame)
-
-                for obj_id, bbox in tracked.items():
-                    x, y, w, h = map(int, bbox)
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    cv2.putText(
-                        frame,
-                        f"ID: {obj_id}",
-                        (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 255, 0),
-                        1,
-                    )
-
-                cv2.imshow("Tracking", frame)
-                if cv2.waitKey(1) & 0xFF == ord("q"):
-                    break
+                profiler.mark("track")
+
+                # Only preview frames are drawn and shown, the others run at
+                # full tracking speed
+                if preview_every and frame_number % preview_every == 0:
+                    # Draw on the overlay copy so the recorded raw frame stays clean
+                    display = frame.overlay
+                    for obj_id, bbox in tracked.items():
+                        x, y, w, h = map(int, bbox)
+                        cv2.rectangle(display, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                        cv2.putText(
+                            display,
+                            f"ID: {obj_id}",
+                            (x, y - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            0.5,
+                            (0, 255, 0),
+                            1,
+                        )
+                    profiler.mark("overlay")
+
+                    if preview_file:
+                        cv2.imwrite(preview_file, display)
+                    if not headless:
+                        cv2.imshow("Tracking", display)
+                        if cv2.waitKey(1) & 0xFF == ord("q"):
+                            break
+                    profiler.mark("display")
 
                 if output_handler:
                     output_handler.write_frame(
                         frame,
-                        [
-                            {"bbox": bbox, "confidence": 1.0}
-                            for bbox in tracked.values()
-                        ],
+                        tracked_annotations(tracked, tracker.confidences),
+                        frame.timestamp,
                     )
+                frame.release()
+                frame_number += 1
+                profiler.mark("record")
+                profiler.end_frame()
 
+        except KeyboardInterrupt:
+            logging.info("Interrupted. Stopping.")
         finally:
+            logging.info(profiler.format_summary())
+            if output_handler:
+                output_handler.add_run_file(DataFormat.PROFILE_JSON, profiler.to_json())
+            if tracker.scale_policy != 1.0:
+                logging.info(f"Resolution policy: {tracker.get_scale_report()}")
+            if input_handler.threaded:
+                logging.info(f"Capture stats: {input_handler.get_capture_stats()}")
             input_handler.release()
-            cv2.destroyAllWindows()
-    else:
-        logging.error("Failed to initialize tracker. Exiting.")
+            tracker.close()
+            if not headless:
+                cv2.destroyAllWindows()
+        return True
+
+    logging.error("Failed to initialize tracker. Exiting.")
+    input_handler.release()
+    tracker.close()
+    return False
+
+
+def process_archive(config, input_path, output_file, log_handler=None):
+    """Re-run tracking over a recorded archive without any GUI or real-time pacing.
+
+    The tracker is initialized from the stored ROI frame and ROI. Returns a dict
+    with the number of frames processed and the processing rate.
+    """
+    input_handler = InputHandler(input_path)
+    metadata = input_handler.get_metadata()
+    roi = metadata.get("roi")
+    if roi is None:
+        logging.error(f"{input_path}: no ROI stored, cannot initialize tracker.")
+        input_handler.release()
+        return {"input": input_path, "success": False, "frames": 0, "fps": 0.0}
+
+    tracker_name, tracker = create_tracker(config)
+    logging.info(f"{input_path}: re-tracking with {tracker_name}")
+
+    # The ROI is a single box or, for several objects, a list of boxes
+    boxes = roi if isinstance(roi[0], (list, tuple)) else [roi]
+    if not tracker.initialize(input_handler.roi_frame, boxes):
+        logging.error(f"{input_path}: failed to initialize tracker.")
+        input_handler.release()
+        tracker.close()
+        return {"input": input_path, "success": False, "frames": 0, "fps": 0.0}
+
+    output_handler = None
+    if output_file:
+        # The output archive is written from the start, it cannot replace the input
+        if os.path.abspath(output_file) == os.path.abspath(input_path):
+            logging.error(f"{input_path}: output would overwrite the input archive.")
+            input_handler.release()
+            tracker.close()
+            return {"input": input_path, "success": False, "frames": 0, "fps": 0.0}
+        output_handler = create_output_handler(
+            config, output_file, metadata["fps"], tuple(metadata["frame_size"]), log_handler
+        )
+        output_handler.set_roi(input_handler.roi_frame, roi)
+
+    profiler = StageProfiler(["capture", "track", "record"])
+    frame_number = 0
+    start_time = time.time()
+    try:
+        while True:
+            profiler.start_frame()
+            image, ret = input_handler.fetch_frame()
+            if not ret:
+                break
+            frame = Frame(image, frame_number)
+            profiler.mark("capture")
+
+            tracked = tracker.update(frame)
+            profiler.mark("track")
+
+            if output_handler:
+                # Keep the original capture time when the source recorded it
+                source = input_handler.get_annotations(frame_number)
+                timestamp = (
+                    source["timestamp_ns"][0] / 1e9
+                    if len(source) and source["timestamp_ns"][0]
+                    else None
+                )
+                output_handler.write_frame(
+                    frame,
+                    tracked_annotations(tracked, tracker.confidences),
+                    timestamp,
+                )
+            frame.release()
+            frame_number += 1
+            profiler.mark("record")
+            profiler.end_frame()
+    finally:
+        input_handler.release()
+        tracker.close()
+
+    elapsed = time.time() - start_time
+    fps = frame_number / elapsed if elapsed > 0 else 0.0
+    logging.info(f"{input_path}: processed {frame_number} frames at {fps:.1f} FPS")
+    if tracker.scale_policy != 1.0:
+        logging.info(f"{input_path}: resolution policy {tracker.get_scale_report()}")
+
+    logging.info(f"{input_path}: {profiler.format_summary()}")
+
+    if output_handler:
+        output_handler.add_run_file(DataFormat.PROFILE_JSON, profiler.to_json())
+        output_handler.finalize()
+        logging.info(f"{input_path}: output saved to {output_handler.output_path}")
+
+    return {"input": input_path, "success": True, "frames": frame_number, "fps": fps}
+
+
+def _process_archive_job(job):
+    # Top-level so it can be pickled for the process pool. Parallelism comes
+    # from the pool, so keep OpenCV from oversubscribing the cores.
+    config, input_path, output_file = job
+    cv2.setNumThreads(1)
+    try:
+        return process_archive(config, input_path, output_file)
+    except Exception as e:
+        logging.error(f"{input_path}: {e}")
+        return {"input": input_path, "success": False, "frames": 0, "fps": 0.0}
+
+
+def process_archive_directory(config, input_dir, output_dir, workers=None):
+    """Re-track every archive in a directory, one archive per worker process"""
+    archives = sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.endswith(".zip")
+    )
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    jobs = [
+        (
+            config,
+            path,
+            os.path.join(output_dir, os.path.basename(path)) if output_dir is not None else None,
+        )
+        for path in archives
+    ]
+    logging.info(f"Re-tracking {len(jobs)} archives from {input_dir}")
+
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_process_archive_job, jobs))
+
+    failed = [r["input"] for r in results if not r["success"]]
+    total_frames = sum(r["frames"] for r in results)
+    elapsed = time.time() - start_time
+    logging.info(
+        f"Processed {len(results) - len(failed)}/{len(results)} archives, "
+        f"{total_frames} frames in {elapsed:.1f}s"
+    )
+    for path in failed:
+        logging.error(f"Failed: {path}")
+    return results
+
+
+def get_output_file(output_arg):
+    if output_arg == "-":
+        return None
+    if output_arg:
+        return f"{output_arg}.zip" if not output_arg.endswith(".zip") else output_arg
+    return f"{datetime.now().strftime(DataFormat.TIMESTAMP_FORMAT)}.zip"
 
 
 def main():
@@ -126,33 +380,51 @@ def main():
     logging.info("Loaded configuration:")
     logging.info(json.dumps(config, indent=2))
 
-    output_handler = None
-    if args.output != "-":
-        if args.output:
-            output_file = (
-                f"{args.output}.zip"
-                if not args.output.endswith(".zip")
-                else args.output
-            )
+    input_source = config.get("input_source", 0)
+
+    if "streams" in config:
+        from multi_stream import run_multi_stream
+
+        if args.output == "-":
+            output_dir = None
+        else:
+            output_dir = args.output or datetime.now().strftime(DataFormat.TIMESTAMP_FORMAT)
+        run_multi_stream(config, output_dir, log_handler)
+        return
+
+    if isinstance(input_source, str) and os.path.isdir(input_source):
+        if args.output == "-":
+            output_dir = None
         else:
-            output_file = f"{datetime.now().strftime('%Y%m%d-%H_%M_%S')}.zip"
+            output_dir = args.output or f"{input_source.rstrip(os.sep)}_retracked"
+        process_archive_directory(config, input_source, output_dir, args.workers)
+        return
 
+    output_file = get_output_file(args.output)
+
+    if isinstance(input_source, str) and input_source.endswith(".zip"):
+        process_archive(config, input_source, output_file, log_handler)
+        return
+
+    if config.get("headless", False) and config.get("initial_boxes") is None:
+        logging.error("Headless mode needs initial_boxes or initial_boxes_file. Exiting.")
+        return
+
+    output_handler = None
+    if output_file:
         fps = 30  # Default FPS, you might want to get this from the input source
         frame_size = (
             640,
             480,
         )  # Default frame size, you might want to get this from the input source
-        output_handler = OutputHandler(output_file, fps, frame_size)
+        output_handler = create_output_handler(config, output_file, fps, frame_size, log_handler)
 
-    if isinstance(config.get("input_source", 0), str) and config[
-        "input_source"
-    ].endswith(".zip"):
-        logging.info("Saved data processing not implemented yet")
-    else:
-        process_live_camera(config, output_handler)
+    if not process_live_camera(config, output_handler):
+        if output_handler:
+            output_handler.discard()
+        return
 
     if output_handler:
-        output_handler.add_file("console.log", log_handler.get_contents())
         output_handler.finalize()
         logging.info(f"Output saved to {output_handler.output_path}")
 
@@ -0,0 +1,208 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import cv2
+from data_io.handlers import InputHandler, create_output_handler, tracked_annotations
+from data_io.data_format import DataFormat
+from data_io.frame import Frame
+from trackers import get_tracker
+from profiling import StageProfiler
+
+
+class Stream:
+    """One source with its own tracker and recording, advanced one frame per step()"""
+
+    def __init__(self, name, config, output_file=None, log_handler=None):
+        self.name = name
+        self.config = config
+        self.output_file = output_file
+        self.log_handler = log_handler
+        self.input_handler = None
+        self.output_handler = None
+        self.tracker = None
+        self.frames = 0
+        self.lag = 0.0
+        self._report_frames = 0
+        self.profiler = StageProfiler(["capture", "track", "record"])
+
+    def start(self):
+        source = self.config.get("input_source", 0)
+        # Only a live source may drop frames, a file waits for the tracker
+        if isinstance(source, str) and os.path.isfile(source):
+            default_policy = InputHandler.DROP_NONE
+        else:
+            default_policy = InputHandler.DROP_LATEST
+        self.input_handler = InputHandler(
+            source,
+            threaded=self.config.get("threaded_capture", True),
+            queue_size=self.config.get("capture_queue_size", 4),
+            drop_policy=self.config.get("capture_drop_policy", default_policy),
+        )
+        self.input_handler.warm_up(self.config.get("warm_up", 2))
+        frame, ret = self.input_handler.fetch_frame()
+        if not ret:
+            raise ValueError(f"{self.name}: could not read a frame")
+
+        tracker_name = self.config.get("tracking_algorithm", "CSRTTracker")
+        self.tracker = get_tracker(tracker_name)(**self.config.get("tracker_options", {}))
+
+        boxes = self.config.get("initial_boxes")
+        if boxes is None:
+            boxes = [self.tracker.select_ROI(frame)]
+        if not self.tracker.initialize(frame, boxes):
+            raise ValueError(f"{self.name}: failed to initialize {tracker_name}")
+        logging.info(f"{self.name}: tracking {len(boxes)} object(s) with {tracker_name}")
+
+        if self.output_file:
+            fps = self.input_handler.cap.get(cv2.CAP_PROP_FPS) or 30
+            frame_size = (frame.shape[1], frame.shape[0])
+            self.output_handler = create_output_handler(
+                self.config, self.output_file, fps, frame_size, self.log_handler
+            )
+            self.output_handler.set_roi(frame, boxes[0] if len(boxes) == 1 else boxes)
+
+    def step(self):
+        """Track and record one frame, returns False when the source is exhausted"""
+        self.profiler.start_frame()
+        image, ret = self.input_handler.fetch_frame()
+        if not ret:
+            return False
+        frame = Frame(image, self.frames, self.input_handler.last_timestamp)
+        self.profiler.mark("capture")
+
+        tracked = self.tracker.update(frame)
+        self.profiler.mark("track")
+        if self.output_handler:
+            self.output_handler.write_frame(
+                frame,
+                tracked_annotations(tracked, self.tracker.confidences),
+                frame.timestamp,
+            )
+        frame.release()
+        self.profiler.mark("record")
+        self.profiler.end_frame()
+
+        self.frames += 1
+        self._report_frames += 1
+        self.lag = time.time() - self.input_handler.last_timestamp
+        return True
+
+    def take_report_frames(self):
+        frames, self._report_frames = self._report_frames, 0
+        return frames
+
+    def close(self):
+        if self.input_handler:
+            self.input_handler.release()
+        if self.tracker is not None:
+            self.tracker.close()
+        if self.profiler.frames:
+            logging.info(f"{self.name}: {self.profiler.format_summary()}")
+        if self.output_handler:
+            self.output_handler.add_run_file(DataFormat.PROFILE_JSON, self.profiler.to_json())
+            self.output_handler.finalize()
+            logging.info(f"{self.name}: output saved to {self.output_handler.output_path}")
+            self.output_handler = None
+
+
+class MultiStreamRunner:
+    """Runs many streams over one shared thread pool.
+
+    Every stream has at most one step in flight and is resubmitted at the back
+    of the pool's FIFO queue when its step finishes, so streams are served
+    round-robin and a slow stream cannot starve the others.
+    """
+
+    def __init__(self, streams, workers=None, report_interval=5.0):
+        self.streams = streams
+        self.workers = workers or os.cpu_count() or 1
+        self.report_interval = report_interval
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        for stream in self.streams:
+            stream.start()
+
+        last_report = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stream") as executor:
+            pending = {executor.submit(stream.step): stream for stream in self.streams}
+            try:
+                while pending:
+                    done, _ = wait(
+                        pending, timeout=self.report_interval, return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        stream = pending.pop(future)
+                        try:
+                            more = future.result()
+                        except Exception as e:
+                            logging.error(f"{stream.name}: {e}")
+                            more = False
+                        if more and not self._stop:
+                            pending[executor.submit(stream.step)] = stream
+                        elif not more:
+                            logging.info(f"{stream.name}: end of feed after {stream.frames} frames")
+
+                    now = time.time()
+                    if now - last_report >= self.report_interval:
+                        self.report(now - last_report)
+                        last_report = now
+            except KeyboardInterrupt:
+                logging.info("Interrupted, waiting for running steps to finish...")
+                self._stop = True
+                wait(pending)
+        return self.get_stats()
+
+    def report(self, elapsed):
+        for stream in self.streams:
+            fps = stream.take_report_frames() / elapsed
+            dropped = stream.input_handler.dropped_frames
+            logging.info(
+                f"{stream.name}: {fps:.1f} FPS, lag {stream.lag * 1000:.0f} ms, "
+                f"{dropped} dropped frames"
+            )
+
+    def get_stats(self):
+        return {
+            stream.name: {
+                "frames": stream.frames,
+                "lag": stream.lag,
+                "dropped_frames": stream.input_handler.dropped_frames,
+            }
+            for stream in self.streams
+        }
+
+
+def run_multi_stream(config, output_dir=None, log_handler=None):
+    """Run every stream listed under "streams" in config. Stream entries override
+    the top-level config keys; "name" and "output" are per stream only."""
+    defaults = {key: value for key, value in config.items() if key != "streams"}
+    streams = []
+    for i, stream_config in enumerate(config["streams"]):
+        stream_config = {**defaults, **stream_config}
+        name = stream_config.get("name", f"stream{i}")
+        output_file = stream_config.get("output")
+        if output_file is None and output_dir is not None:
+            output_file = os.path.join(output_dir, f"{name}.zip")
+        if output_file == "-":
+            output_file = None
+        streams.append(Stream(name, stream_config, output_file, log_handler))
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    runner = MultiStreamRunner(
+        streams, config.get("workers"), config.get("report_interval", 5.0)
+    )
+    try:
+        stats = runner.run()
+    finally:
+        for stream in streams:
+            stream.close()
+    for name, stream_stats in stats.items():
+        logging.info(f"{name}: {stream_stats}")
+    return stats
@@ -0,0 +1,130 @@
+import json
+import time
+import numpy as np
+
+
+class StageProfiler:
+    """Per-stage timing of a frame loop.
+
+    Call start_frame() at the top of the loop and mark(stage) after each
+    stage: a mark costs one clock read and charges the time since the previous
+    mark to that stage. Per-frame timings are kept in blocks of preallocated
+    arrays (the most recent max_records frames) and folded into per-stage
+    latency histograms covering the whole run.
+    """
+
+    # Histogram bin edges in microseconds: 20 per decade from 1 us to 100 s
+    HISTOGRAM_EDGES_US = np.logspace(0, 8, 161)
+
+    def __init__(self, stages, max_records=100000, block_size=1024):
+        self.stages = list(stages)
+        self._index = {stage: i for i, stage in enumerate(self.stages)}
+        self.max_records = max_records
+        self.block_size = block_size
+        self.histograms = np.zeros(
+            (len(self.stages) + 1, len(self.HISTOGRAM_EDGES_US) + 1), dtype=np.int64
+        )
+        self.frames = 0
+        self._blocks = []  # Full blocks of (frames, stages + 1) ns, total last
+        self._block = np.zeros((block_size, len(self.stages) + 1), dtype=np.int64)
+        self._row = 0
+        self._frame_start = None
+        self._last = None
+
+    def start_frame(self):
+        self._frame_start = self._last = time.perf_counter_ns()
+
+    def mark(self, stage):
+        now = time.perf_counter_ns()
+        self._block[self._row, self._index[stage]] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        self._block[self._row, -1] = self._last - self._frame_start
+        self._frame_start = None
+        self.frames += 1
+        self._row += 1
+        if self._row == self.block_size:
+            self._flush()
+
+    def _flush(self):
+        if self._row == 0:
+            return
+        block = self._block[:self._row]
+        bins = np.searchsorted(self.HISTOGRAM_EDGES_US, block / 1000)
+        for column in range(block.shape[1]):
+            self.histograms[column] += np.bincount(bins[:, column], minlength=self.histograms.shape[1])
+        self._blocks.append(block.copy())
+        while sum(len(b) for b in self._blocks) - len(self._blocks[0]) >= self.max_records:
+            self._blocks.pop(0)
+        self._block[:] = 0
+        self._row = 0
+
+    def records(self):
+        """(frames, stages + 1) array in ns of the most recent frames, total last"""
+        self._flush()
+        if not self._blocks:
+            return np.zeros((0, len(self.stages) + 1), dtype=np.int64)
+        return np.concatenate(self._blocks)[-self.max_records:]
+
+    def summary(self):
+        """Per-stage mean, p50, p99 and max in ms and share of the frame time.
+        Percentiles come from the histograms (bin upper edges) once older
+        frames have been dropped, mean and max from the stored frames."""
+        records = self.records()
+        exact = len(records) == self.frames
+        summary = {}
+        for column, stage in enumerate(self.stages + ["total"]):
+            values = records[:, column] / 1e6
+            if exact and len(values):
+                p50, p99 = np.percentile(values, [50, 99])
+            else:
+                p50, p99 = self._histogram_percentiles(column, [50, 99])
+            summary[stage] = {
+                "mean_ms": float(values.mean()) if len(values) else 0.0,
+                "p50_ms": float(p50),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max()) if len(values) else 0.0,
+                "share": float(values.sum() / max(records[:, -1].sum() / 1e6, 1e-12)),
+            }
+        return summary
+
+    def _histogram_percentiles(self, column, percentiles):
+        counts = self.histograms[column]
+        if counts.sum() == 0:
+            return [0.0] * len(percentiles)
+        cumulative = np.cumsum(counts) / counts.sum()
+        edges = np.append(self.HISTOGRAM_EDGES_US, np.inf)
+        return [edges[np.searchsorted(cumulative, p / 100)] / 1000 for p in percentiles]
+
+    def format_summary(self):
+        lines = [f"Stage timings over {self.frames} frames:"]
+        for stage, s in self.summary().items():
+            lines.append(
+                f"  {stage:10s} mean {s['mean_ms']:8.2f} ms  p50 {s['p50_ms']:8.2f} ms  "
+                f"p99 {s['p99_ms']:8.2f} ms  max {s['max_ms']:8.2f} ms  {100 * s['share']:5.1f}%"
+            )
+        return "\n".join(lines)
+
+    def to_json(self):
+        """Summary, histograms and per-frame records (microseconds) as JSON"""
+        records = self.records()
+        return json.dumps(
+            {
+                "stages": self.stages,
+                "frames": self.frames,
+                "first_record_frame": self.frames - len(records),
+                "summary": self.summary(),
+                "histogram_edges_us": self.HISTOGRAM_EDGES_US.round(3).tolist(),
+                "histograms": {
+                    stage: self.histograms[column].tolist()
+                    for column, stage in enumerate(self.stages + ["total"])
+                },
+                "records_us": {
+                    stage: (records[:, column] // 1000).tolist()
+                    for column, stage in enumerate(self.stages + ["total"])
+                },
+            }
+        )
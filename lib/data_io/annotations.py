@@ -0,0 +1,332 @@
+# File: vision_track/lib/data_io/annotations.py
+import struct
+from array import array
+import cv2
+import numpy as np
+from .data_format import DataFormat
+
+# Version 2 record, must match DataFormat.ANNOTATION_DTYPE field by field
+_V2_RECORD = struct.Struct("<Ii4ffq")
+assert _V2_RECORD.size == DataFormat.ANNOTATION_DTYPE.itemsize
+
+
+class AnnotationIndex:
+    """All annotations of a recording in one structured array (DataFormat.ANNOTATION_DTYPE)
+    plus a frame -> row range index, so per-frame lookups are O(1) views."""
+
+    def __init__(self, records, frame_numbers, offsets, truncated=False):
+        self.records = records
+        self.frame_numbers = frame_numbers
+        self.offsets = offsets  # Rows of frame i are records[offsets[i]:offsets[i + 1]]
+        self.truncated = truncated
+        # Frames are normally written as 0, 1, 2, ... which allows direct indexing
+        self._contiguous = bool(
+            np.array_equal(frame_numbers, np.arange(len(frame_numbers)))
+        )
+
+    @classmethod
+    def from_bytes(cls, data, version=None):
+        """Decode an annotations stream of either version. data may be any buffer,
+        version 2 records are then viewed in place (e.g. in a memory map) without
+        being copied. If version is None it is detected from the stream."""
+        if version is None:
+            version = detect_version(data)
+        if version == 2:
+            return cls._from_v2(data)
+        if version != 1:
+            raise ValueError(f"Unsupported annotation format version {version}")
+        return cls._from_v1(data)
+
+    @classmethod
+    def _from_v2(cls, data):
+        header = DataFormat.ANNOTATION_V2_HEADER
+        dtype = DataFormat.ANNOTATION_DTYPE
+        magic, _, record_size = header.unpack_from(data, 0)
+        if magic != DataFormat.ANNOTATION_V2_MAGIC or record_size != dtype.itemsize:
+            raise ValueError("Not a version 2 annotation stream")
+
+        index = _read_v2_footer(data)
+        if index is not None:
+            index_offset, n_frames, n_records = index
+            records = np.frombuffer(data, dtype=dtype, count=n_records, offset=header.size)
+            offsets = np.frombuffer(data, dtype="<u8", count=n_frames + 1, offset=index_offset)
+            return cls(records, np.arange(n_frames, dtype=np.uint32), offsets.astype(np.int64))
+
+        # No footer (recording was not closed): records are still valid and
+        # sorted by frame, so rebuild the index from the frame column
+        n_records = _count_v2_records(data)
+        records = np.frombuffer(data, dtype=dtype, count=n_records, offset=header.size)
+        n_frames = int(records["frame"][-1]) + 1 if n_records else 0
+        offsets = np.searchsorted(records["frame"], np.arange(n_frames + 1)).astype(np.int64)
+        truncated = header.size + n_records * record_size != len(data)
+        return cls(records, np.arange(n_frames, dtype=np.uint32), offsets, truncated=truncated)
+
+    @classmethod
+    def _from_v1(cls, data):
+        header = DataFormat.ANNOTATION_HEADER
+        item = DataFormat.ANNOTATION_ITEM
+        buf = np.frombuffer(data, dtype=np.uint8)
+
+        # Fast path: every frame has the same number of annotations, so the
+        # headers sit at a fixed stride and can be read without a Python loop.
+        layout = cls._fixed_stride_layout(data)
+        if layout is not None:
+            frame_numbers, counts, starts = layout
+            truncated = False
+            n_frames, count = len(counts), int(counts[0]) if len(counts) else 0
+            values = np.ndarray(
+                shape=(n_frames, count, 5),
+                dtype="<f4",
+                buffer=data,
+                offset=header.size,
+                strides=(header.size + count * item.size, item.size, 4),
+            ).reshape(-1, 5)
+        else:
+            frame_numbers, counts, starts, truncated = cls._scan_headers(data)
+            # Mark where each frame's items start (+1) and end (-1); the running
+            # sum is then a mask of item bytes and one boolean gather packs them
+            marks = np.zeros(len(buf) + 1, dtype=np.int8)
+            item_starts = starts + header.size
+            np.add.at(marks, item_starts, 1)
+            np.add.at(marks, item_starts + counts * item.size, -1)
+            keep = np.cumsum(marks[:-1], dtype=np.int8).astype(bool)
+            values = buf[keep].view("<f4").reshape(-1, 5)
+
+        total = int(counts.sum())
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        records = np.empty(total, dtype=DataFormat.ANNOTATION_DTYPE)
+        records["frame"] = np.repeat(frame_numbers, counts)
+        records["object_id"] = -1
+        records["timestamp_ns"] = 0
+        for column, name in enumerate(("x", "y", "w", "h", "confidence")):
+            records[name] = values[:, column]
+        return cls(records, frame_numbers, offsets, truncated)
+
+    @staticmethod
+    def _fixed_stride_layout(data):
+        header = DataFormat.ANNOTATION_HEADER
+        item = DataFormat.ANNOTATION_ITEM
+        if len(data) < header.size:
+            return None
+        count = header.unpack_from(data, 0)[1]
+        stride = header.size + count * item.size
+        if len(data) % stride:
+            return None
+        n_frames = len(data) // stride
+        headers = np.ndarray(
+            shape=(n_frames,),
+            dtype=np.dtype([("frame", "<u4"), ("count", "<u2")]),
+            buffer=data,
+            strides=(stride,),
+        )
+        counts = headers["count"].astype(np.int64)
+        if np.any(counts != count):
+            return None
+        starts = np.arange(n_frames, dtype=np.int64) * stride
+        return headers["frame"].copy(), counts, starts
+
+    @staticmethod
+    def _scan_headers(data):
+        # One pass over the headers only, the items are gathered afterwards
+        header = DataFormat.ANNOTATION_HEADER
+        item_size = DataFormat.ANNOTATION_ITEM.size
+        unpack_from = header.unpack_from
+        header_size = header.size
+        size = len(data)
+        frame_numbers, counts, starts = [], [], []
+        offset = 0
+        truncated = False
+        while offset < size:
+            if size - offset < header_size:
+                truncated = True
+                break
+            frame_num, num_ann = unpack_from(data, offset)
+            end = offset + header_size + num_ann * item_size
+            if end > size:
+                # Keep the complete items of a partially written last frame
+                num_ann = (size - offset - header_size) // item_size
+                truncated = True
+            frame_numbers.append(frame_num)
+            counts.append(num_ann)
+            starts.append(offset)
+            offset = end
+        return (
+            np.array(frame_numbers, dtype=np.uint32),
+            np.array(counts, dtype=np.int64),
+            np.array(starts, dtype=np.int64),
+            truncated,
+        )
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def get(self, frame_number):
+        if self._contiguous:
+            position = frame_number
+        else:
+            position = int(np.searchsorted(self.frame_numbers, frame_number))
+            if position >= len(self.frame_numbers) or self.frame_numbers[position] != frame_number:
+                return self.records[:0]
+        if position < 0 or position >= len(self.frame_numbers):
+            return self.records[:0]
+        return self.records[self.offsets[position]:self.offsets[position + 1]]
+
+
+def detect_version(data):
+    if bytes(data[:len(DataFormat.ANNOTATION_V2_MAGIC)]) == DataFormat.ANNOTATION_V2_MAGIC:
+        return 2
+    return 1
+
+
+def _read_v2_footer(data):
+    # Returns (index_offset, n_frames, n_records) or None if there is no valid footer
+    header = DataFormat.ANNOTATION_V2_HEADER
+    footer = DataFormat.ANNOTATION_V2_FOOTER
+    record_size = DataFormat.ANNOTATION_DTYPE.itemsize
+    if len(data) < header.size + footer.size:
+        return None
+    index_offset, n_frames, n_records, magic = footer.unpack_from(data, len(data) - footer.size)
+    if (
+        magic != DataFormat.ANNOTATION_V2_INDEX_MAGIC
+        # Records, end marker, index. Streams closed before the end marker
+        # was introduced have the index right after the records.
+        or (index_offset - header.size) // record_size not in (n_records, n_records + 1)
+        or (index_offset - header.size) % record_size
+        or index_offset + (n_frames + 1) * 8 + footer.size != len(data)
+    ):
+        return None
+    return index_offset, n_frames, n_records
+
+
+def _count_v2_records(data):
+    # Number of complete records of a version 2 stream without a valid footer.
+    # close() writes an end marker record before the index, so the records
+    # end at the first marker, or with the last complete record if close()
+    # never got to write it.
+    header = DataFormat.ANNOTATION_V2_HEADER
+    n_max = (len(data) - header.size) // DataFormat.ANNOTATION_DTYPE.itemsize
+    frames = np.frombuffer(
+        data, dtype=DataFormat.ANNOTATION_DTYPE, count=n_max, offset=header.size
+    )["frame"]
+    marker = np.flatnonzero(frames == DataFormat.ANNOTATION_V2_END_FRAME)
+    return int(marker[0]) if len(marker) else n_max
+
+
+class AnnotationWriter:
+    """Writes an annotations stream of the given format version to a binary file object.
+
+    Version 2 streams can be reopened with append() to continue a recording; the
+    index and footer are only written by close().
+    """
+
+    def __init__(self, file, version=DataFormat.ANNOTATION_FORMAT_VERSION):
+        if version not in (1, 2):
+            raise ValueError(f"Unsupported annotation format version {version}")
+        self.file = file
+        self.version = version
+        self.record_count = 0
+        self._frame_starts = array("Q")  # First record of every frame (version 2)
+        if version == 2 and file.tell() == 0:
+            file.write(
+                DataFormat.ANNOTATION_V2_HEADER.pack(
+                    DataFormat.ANNOTATION_V2_MAGIC, 2, DataFormat.ANNOTATION_DTYPE.itemsize
+                )
+            )
+
+    @classmethod
+    def append(cls, path):
+        """Reopen a closed (or interrupted) version 2 stream for appending"""
+        f = open(path, "r+b")
+        data = f.read()
+        index = _read_v2_footer(data)
+        record_size = DataFormat.ANNOTATION_DTYPE.itemsize
+        if index is not None:
+            index_offset, n_frames, n_records = index
+            starts = np.frombuffer(data, dtype="<u8", count=n_frames, offset=index_offset)
+        else:
+            existing = AnnotationIndex.from_bytes(data, 2)
+            n_records = len(existing.records)
+            starts = existing.offsets[:-1]
+        end = DataFormat.ANNOTATION_V2_HEADER.size + n_records * record_size
+        f.seek(end)
+        f.truncate()
+
+        writer = cls(f, 2)
+        writer.record_count = n_records
+        writer._frame_starts = array("Q", starts.astype(np.uint64).tobytes())
+        return writer
+
+    def write_frame(self, frame_number, annotations, timestamp_ns=0):
+        if self.version == 1:
+            self._write_v1(frame_number, annotations)
+        else:
+            self._write_v2(frame_number, annotations, timestamp_ns)
+
+    def _write_v1(self, frame_number, annotations):
+        # Pack the whole frame record into one buffer and write it once
+        header_size = DataFormat.ANNOTATION_HEADER.size
+        item_size = DataFormat.ANNOTATION_ITEM.size
+        record = bytearray(header_size + item_size * len(annotations))
+        DataFormat.ANNOTATION_HEADER.pack_into(record, 0, frame_number, len(annotations))
+        for i, ann in enumerate(annotations):
+            DataFormat.ANNOTATION_ITEM.pack_into(
+                record, header_size + i * item_size, *ann['bbox'], ann['confidence']
+            )
+        self.file.write(record)
+
+    def _write_v2(self, frame_number, annotations, timestamp_ns):
+        if frame_number >= DataFormat.ANNOTATION_V2_END_FRAME:
+            raise ValueError(f"Frame number {frame_number} out of range")
+        # Frames without annotations (or skipped frame numbers) still get an index entry
+        while len(self._frame_starts) <= frame_number:
+            self._frame_starts.append(self.record_count)
+        if not annotations:
+            return
+        record = bytearray(_V2_RECORD.size * len(annotations))
+        for i, ann in enumerate(annotations):
+            _V2_RECORD.pack_into(
+                record,
+                i * _V2_RECORD.size,
+                frame_number,
+                ann.get('object_id', -1),
+                *ann['bbox'],
+                ann['confidence'],
+                timestamp_ns,
+            )
+        self.file.write(record)
+        self.record_count += len(annotations)
+
+    def close(self):
+        if self.version == 2:
+            # The end marker tells where the records end should the index be
+            # left incomplete
+            self.file.write(
+                _V2_RECORD.pack(DataFormat.ANNOTATION_V2_END_FRAME, -1, 0, 0, 0, 0, 0, 0)
+            )
+            index_offset = self.file.tell()
+            starts = np.frombuffer(self._frame_starts, dtype=np.uint64)
+            self.file.write(starts.astype("<u8").tobytes())
+            self.file.write(np.uint64(self.record_count).astype("<u8").tobytes())
+            self.file.write(
+                DataFormat.ANNOTATION_V2_FOOTER.pack(
+                    index_offset,
+                    len(self._frame_starts),
+                    self.record_count,
+                    DataFormat.ANNOTATION_V2_INDEX_MAGIC,
+                )
+            )
+        self.file.close()
+
+
+def draw_annotations(image, boxes, confidences):
+    """Draw every (x, y, w, h) box and its confidence onto image in place, this
+    is the overlay of the annotated video. Returns image."""
+    for bbox, confidence in zip(boxes, confidences):
+        x, y, w, h = map(int, bbox)
+        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(
+            image, f"{confidence:.2f}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1
+        )
+    return image
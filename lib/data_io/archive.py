@@ -0,0 +1,108 @@
+# File: vision_track/lib/data_io/archive.py
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+import cv2
+
+# Local file header: signature (4s), versions/flags/method/times/crc/sizes (22 bytes),
+# file name length (H), extra field length (H)
+_LOCAL_HEADER = struct.Struct("<4s22xHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+def member_data_offset(zip_file, name):
+    """Return (offset, size) of a ZIP_STORED member's bytes inside the archive file,
+    or None if the member is compressed and cannot be read in place."""
+    info = zip_file.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+        return None
+
+    # The central directory does not record the length of the local extra field,
+    # so read the local header to find where the data starts.
+    zip_file.fp.seek(info.header_offset)
+    header = zip_file.fp.read(_LOCAL_HEADER.size)
+    signature, name_length, extra_length = _LOCAL_HEADER.unpack(header)
+    if signature != _LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header for {name}")
+    offset = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+    return offset, info.file_size
+
+
+def map_member(zip_path, zip_file, name):
+    """Return the contents of an archive member as a read-only buffer.
+
+    Stored members are memory-mapped in place, compressed members are read
+    into memory.
+    """
+    location = member_data_offset(zip_file, name)
+    if location is None or location[1] == 0:
+        return zip_file.read(name)
+    offset, size = location
+    with open(zip_path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped)[offset:offset + size]
+
+
+def open_member_capture(zip_path, zip_file, name):
+    """Open a video member of an archive with cv2.VideoCapture.
+
+    Stored members are opened in place through FFmpeg's subfile protocol, so no
+    data is copied. Otherwise the member is streamed into a private temporary
+    directory. Returns (capture, temp_dir); temp_dir is None when nothing was
+    extracted and must be removed by the caller otherwise.
+    """
+    location = member_data_offset(zip_file, name)
+    if location is not None:
+        offset, size = location
+        url = f"subfile,,start,{offset},end,{offset + size},,:{os.path.abspath(zip_path)}"
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        if cap.isOpened():
+            return cap, None
+        cap.release()
+
+    temp_dir = tempfile.mkdtemp(prefix="vision_track_")
+    temp_path = os.path.join(temp_dir, os.path.basename(name))
+    with zip_file.open(name) as src, open(temp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    cap = cv2.VideoCapture(temp_path, cv2.CAP_FFMPEG)
+    return cap, temp_dir
+
+
+class ArchiveWriter:
+    """Write the members of an output archive straight into the ZIP file.
+
+    Members are stored uncompressed, so they can be read in place (see
+    map_member), with ZIP64 extensions where needed, so neither members nor
+    the archive have a size limit. writestr() may be called from any thread.
+    Files that only an external writer can produce (cv2.VideoWriter needs a
+    path) are moved in with move_file().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True)
+        self._lock = threading.Lock()
+
+    def namelist(self):
+        with self._lock:
+            return self._zip.namelist()
+
+    def writestr(self, name, data):
+        with self._lock:
+            self._zip.writestr(name, data)
+
+    def move_file(self, name, path):
+        """Copy a file into the archive and delete it"""
+        with self._lock:
+            self._zip.write(path, arcname=name)
+        os.remove(path)
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
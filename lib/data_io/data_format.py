@@ -3,6 +3,7 @@ from datetime import datetime
 import struct
 import zipfile
 import json
+import numpy as np
 
 
 class DataFormat:
@@ -16,14 +17,57 @@ class DataFormat:
     METADATA_JSON = "metadata.json"
     ROI_FRAME = "roi_frame.png"
     README = "README.txt"
+    FRAME_INDEX = "frame_index.npy"  # Optional, added by FrameReader on first open
+    PROFILE_JSON = "profile.json"  # Optional, per-stage timings of the recording loop
+    CONSOLE_LOG = "console.log"  # Optional, log of the run
+    # Optional chunked frame store replacing RAW_VIDEO, see get_readme_content
+    FRAME_STORE_INDEX = "frames/index.json"
+    FRAME_STORE_CHUNK = "frames/chunk_{:05d}.bin"
 
     # Metadata structure
     METADATA_KEYS = ["frame_count", "fps", "frame_size", "roi"]
+    OPTIONAL_METADATA_KEYS = ["annotation_format_version", "annotated_video", "segment"]
 
-    # Binary annotation format using struct module
+    # Value of "annotated_video" in the metadata of archives without an annotated
+    # video; it is rendered from the raw video and annotations when needed
+    ANNOTATED_VIDEO_DERIVED = "derived"
+
+    # Annotation format version written by OutputHandler. Archives without
+    # "annotation_format_version" in their metadata use version 1.
+    ANNOTATION_FORMAT_VERSION = 2
+
+    # Version 1 binary annotation format using struct module
     ANNOTATION_HEADER = struct.Struct("<IH")  # Frame number (I), num_annotations (H)
     ANNOTATION_ITEM = struct.Struct("<4f f")  # bbox (4f), confidence (f)
 
+    # Version 2: file header, fixed-width records, index, footer
+    ANNOTATION_V2_MAGIC = b"VTA2"
+    ANNOTATION_V2_INDEX_MAGIC = b"VTAI"
+    ANNOTATION_V2_HEADER = struct.Struct("<4sHH8x")  # magic, version, record size (16 bytes)
+    # Frame number of the end marker record written between the records and the index
+    ANNOTATION_V2_END_FRAME = 0xFFFFFFFF
+    # Index offset, number of frames, number of records, index magic
+    ANNOTATION_V2_FOOTER = struct.Struct("<QQQ4s")
+
+    # One row per annotation. This is both the version 2 record layout on disk
+    # and the in-memory layout of decoded annotations of either version.
+    ANNOTATION_DTYPE = np.dtype(
+        [
+            ("frame", "<u4"),
+            ("object_id", "<i4"),  # -1 when unknown (version 1)
+            ("x", "<f4"),
+            ("y", "<f4"),
+            ("w", "<f4"),
+            ("h", "<f4"),
+            ("confidence", "<f4"),
+            ("timestamp_ns", "<i8"),  # Capture time, 0 when unknown (version 1)
+        ]
+    )
+
+    # Frame index of the raw video: byte offset and size of each frame within
+    # the video file and whether it is a keyframe (stored with numpy.save)
+    FRAME_INDEX_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4"), ("keyframe", "u1")])
+
     # Video codec settings
     VIDEO_CODEC = "HFYU"  # HuffYUV lossless codec
     VIDEO_CODEC_EXTENSION = ".avi"
@@ -31,15 +75,56 @@ class DataFormat:
     @classmethod
     def get_readme_content(cls):
         return f"""This archive contains tracking data in the following structure:
-1. {cls.RAW_VIDEO}: Raw video footage ({cls.VIDEO_CODEC} codec)
-2. {cls.ANNOTATED_VIDEO}: Annotated video with tracking overlay
-3. {cls.ANNOTATIONS_BIN}: Binary tracking data with format:
-   - Header: {cls.ANNOTATION_HEADER.format} (frame_number, num_annotations)
-   - Per annotation: {cls.ANNOTATION_ITEM.format} (x, y, w, h, confidence)
+1. {cls.RAW_VIDEO}: Raw video footage ({cls.VIDEO_CODEC} codec). Replaced by the frame store
+   below in archives recorded with it
+2. {cls.ANNOTATED_VIDEO} (optional): Annotated video with tracking overlay. Not stored
+   when "annotated_video" is "{cls.ANNOTATED_VIDEO_DERIVED}" in {cls.METADATA_JSON}: it is then derived
+   from {cls.RAW_VIDEO} and {cls.ANNOTATIONS_BIN} by drawing every box with its confidence
+3. {cls.ANNOTATIONS_BIN}: Binary tracking data, see below
 4. {cls.METADATA_JSON}: JSON metadata with tracking parameters
 5. {cls.ROI_FRAME}: Initial ROI selection frame
+6. {cls.FRAME_INDEX} (optional): Frame index of {cls.RAW_VIDEO} in NumPy .npy format,
+   one record per frame: {", ".join(f"{name} ({cls.FRAME_INDEX_DTYPE[name].str})" for name in cls.FRAME_INDEX_DTYPE.names)}
+   offset and size locate the frame data within {cls.RAW_VIDEO}
+7. {cls.PROFILE_JSON} (optional): Per-stage timings of the loop that produced the
+   recording: summary, latency histograms and per-frame records in microseconds
+8. {cls.CONSOLE_LOG} (optional): Log of the run, of this segment only in segmented recordings
+9. {cls.FRAME_STORE_INDEX} and {cls.FRAME_STORE_CHUNK.format(0)}, ... (optional): Chunked frame
+   store of the raw frames instead of {cls.RAW_VIDEO}. Each chunk holds chunk_frames
+   consecutive frames (fewer in the last chunk) as one compressed block of raw
+   uint8 pixels, frame after frame in row-major (height, width, channels) BGR order.
+   Chunks are compressed independently with zlib or LZ4 (frame format) and can be
+   decoded in any order. The JSON index holds frame_count, chunk_frames,
+   frame_shape, dtype, codec and the list of chunks (name, frames);
+   frame N is frame N % chunk_frames of chunk N // chunk_frames
 
 All numeric values are little-endian. Video frame size and FPS are stored in metadata.
+
+Segmented recordings are split into archives of this structure, one per segment.
+Each segment is self-contained: frame numbers restart at 0 and the ROI is the
+tracked boxes of its first frame, stored as its ROI frame. "segment" in
+{cls.METADATA_JSON} holds its index, first_frame (frame number within the whole
+recording) and start_time (capture time of its first frame, seconds since the epoch).
+
+The annotation format version is stored as "annotation_format_version" in
+{cls.METADATA_JSON} (missing means version 1).
+
+Version 1 is a sequence of per-frame records:
+   - Header: {cls.ANNOTATION_HEADER.format} (frame_number, num_annotations)
+   - Per annotation: {cls.ANNOTATION_ITEM.format} (x, y, w, h, confidence)
+
+Version 2 consists of:
+   - Header ({cls.ANNOTATION_V2_HEADER.size} bytes): {cls.ANNOTATION_V2_HEADER.format} (magic "{cls.ANNOTATION_V2_MAGIC.decode()}", version, record_size)
+   - Fixed-width records of {cls.ANNOTATION_DTYPE.itemsize} bytes, sorted by frame:
+     {", ".join(f"{name} ({cls.ANNOTATION_DTYPE[name].str})" for name in cls.ANNOTATION_DTYPE.names)}
+     object_id is -1 when unknown, timestamp_ns is the capture time in nanoseconds
+   - End marker: one record with frame {cls.ANNOTATION_V2_END_FRAME:#x}
+   - Index: frame_count + 1 <u8 record numbers, records of frame N are [index[N], index[N + 1])
+   - Footer: {cls.ANNOTATION_V2_FOOTER.format} (index_offset, frame_count, record_count, magic "{cls.ANNOTATION_V2_INDEX_MAGIC.decode()}")
+   The end marker, index and footer are written when the recording is closed.
+   If the footer is missing the records up to the end marker (or the last
+   complete record) are still valid and the index can be rebuilt from the
+   frame column.
 """
 
 
@@ -49,8 +134,6 @@ class DatasetValidator:
 
     def validate_zip_structure(self):
         required_files = [
-            DataFormat.RAW_VIDEO,
-            DataFormat.ANNOTATED_VIDEO,
             DataFormat.ANNOTATIONS_BIN,
             DataFormat.METADATA_JSON,
             DataFormat.ROI_FRAME,
@@ -58,52 +141,37 @@ class DatasetValidator:
         ]
         
         with zipfile.ZipFile(self.dataset_path, 'r') as zip_ref:
-            return all(file in zip_ref.namelist() for file in required_files)
+            names = zip_ref.namelist()
+            if not all(file in names for file in required_files):
+                return False
+            if DataFormat.RAW_VIDEO not in names and DataFormat.FRAME_STORE_INDEX not in names:
+                return False
+            if DataFormat.ANNOTATED_VIDEO in names:
+                return True
+            # The annotated video may only be missing when it is derived
+            with zip_ref.open(DataFormat.METADATA_JSON) as f:
+                metadata = json.load(f)
+            return metadata.get("annotated_video") == DataFormat.ANNOTATED_VIDEO_DERIVED
 
     def validate_metadata(self):
         with zipfile.ZipFile(self.dataset_path, 'r') as zip_ref:
             with zip_ref.open(DataFormat.METADATA_JSON) as f:
                 metadata = json.load(f)
-                return set(metadata.keys()) == set(DataFormat.METADATA_KEYS)
+                keys = set(metadata.keys())
+                required = set(DataFormat.METADATA_KEYS)
+                return required <= keys <= required | set(DataFormat.OPTIONAL_METADATA_KEYS)
 
     def validate_annotations(self):
-        with zipfile.ZipFile(self.dataset_path, 'r') as zip_ref:
-            with zip_ref.open(DataFormat.ANNOTATIONS_BIN) as f:
-                annotations_data = f.read()  # Read the entire file
-                offset = 0
-                while offset < len(annotations_data):
-                    # Read header
-                    if len(annotations_data) - offset < DataFormat.ANNOTATION_HEADER.size:
-                        break  # Not enough data left for a full header
-                    header = DataFormat.ANNOTATION_HEADER.unpack_from(annotations_data, offset)
-                    offset += DataFormat.ANNOTATION_HEADER.size
-                    num_annotations = header[1]
-                    for _ in range(num_annotations):
-                        if len(annotations_data) - offset < DataFormat.ANNOTATION_ITEM.size:
-                            break  # Not enough data left for an annotation item
-                        annotation = DataFormat.ANNOTATION_ITEM.unpack_from(annotations_data, offset)
-                        offset += DataFormat.ANNOTATION_ITEM.size
-                return True  # Add more checks as needed
-    
-    def validate_annotations(self):
-        with zipfile.ZipFile(self.dataset_path, 'r') as zip_ref:
-            with zip_ref.open(DataFormat.ANNOTATIONS_BIN) as f:
-                annotations_data = f.read()  # Read the entire file
-                offset = 0
-                while offset < len(annotations_data):
-                    # Read header
-                    if len(annotations_data) - offset < DataFormat.ANNOTATION_HEADER.size:
-                        break  # Not enough data left for a full header
-                    header = DataFormat.ANNOTATION_HEADER.unpack_from(annotations_data, offset)
-                    offset += DataFormat.ANNOTATION_HEADER.size
-                    num_annotations = header[1]
-                    for _ in range(num_annotations):
-                        if len(annotations_data) - offset < DataFormat.ANNOTATION_ITEM.size:
-                            break  # Not enough data left for an annotation item
-                        annotation = DataFormat.ANNOTATION_ITEM.unpack_from(annotations_data, offset)
-                        offset += DataFormat.ANNOTATION_ITEM.size
-                return True  # Add more checks as needed
+        # Imported here to avoid a circular import, annotations.py needs DataFormat
+        from .annotations import AnnotationIndex
 
+        with zipfile.ZipFile(self.dataset_path, 'r') as zip_ref:
+            with zip_ref.open(DataFormat.METADATA_JSON) as f:
+                version = json.load(f).get("annotation_format_version", 1)
+            annotations = AnnotationIndex.from_bytes(
+                zip_ref.read(DataFormat.ANNOTATIONS_BIN), version
+            )
+        return not annotations.truncated  # Add more checks as needed
 
     def validate(self):
         return self.validate_zip_structure() and self.validate_metadata() and self.validate_annotations()
\ No newline at end of file
@@ -0,0 +1,167 @@
+# File: vision_track/lib/data_io/export.py
+import argparse
+import json
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from .annotations import AnnotationIndex, draw_annotations
+from .archive import map_member
+from .data_format import DataFormat
+from .frame_reader import FrameReader
+
+
+class AnnotatedExporter:
+    """Render the annotated video of a recorded archive from its raw video and
+    annotations.
+
+    Frames are rendered in chunks of chunk_size consecutive frames on worker
+    threads, each decoding with its own FrameReader, and handed out in frame
+    order. Works for archives with or without a recorded annotated video.
+    """
+
+    def __init__(self, archive_path, workers=None, chunk_size=32):
+        self.archive_path = archive_path
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # Opened first so the frame index is cached once, not by every worker
+        self.reader = FrameReader(archive_path)
+        with zipfile.ZipFile(archive_path, "r") as zip_file:
+            with zip_file.open(DataFormat.METADATA_JSON) as f:
+                self.metadata = json.load(f)
+            self.annotations = AnnotationIndex.from_bytes(
+                map_member(archive_path, zip_file, DataFormat.ANNOTATIONS_BIN),
+                self.metadata.get("annotation_format_version", 1),
+            )
+        self._local = threading.local()
+        self._readers = [self.reader]
+        self._readers_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.reader)
+
+    def _thread_reader(self):
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = FrameReader(self.archive_path, cache_index=False)
+            self._local.reader = reader
+            with self._readers_lock:
+                self._readers.append(reader)
+        return reader
+
+    def _annotate(self, frame_number, image):
+        records = self.annotations.get(frame_number)
+        boxes = zip(records["x"], records["y"], records["w"], records["h"])
+        return draw_annotations(image, boxes, records["confidence"])
+
+    def _render_chunk(self, start, stop):
+        reader = self._thread_reader()
+        return [self._annotate(i, image) for i, image in reader.iter_frames(start, stop)]
+
+    def get_frame(self, frame_number):
+        """Annotated image of a single frame"""
+        return self._annotate(frame_number, self.reader.get_frame(frame_number))
+
+    def iter_frames(self, start=0, stop=None):
+        """Yield (frame_number, annotated image) for range(start, stop) in order"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        chunks = iter(range(start, stop, self.chunk_size))
+        with ThreadPoolExecutor(self.workers) as pool:
+            # At most two chunks per worker are held in memory
+            pending = deque()
+
+            def submit():
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    end = min(chunk + self.chunk_size, stop)
+                    pending.append((chunk, pool.submit(self._render_chunk, chunk, end)))
+
+            for _ in range(2 * self.workers):
+                submit()
+            while pending:
+                chunk, future = pending.popleft()
+                images = future.result()
+                submit()
+                for offset, image in enumerate(images):
+                    yield chunk + offset, image
+
+    def export_video(self, output_path, start=0, stop=None):
+        """Write the annotated frames to a video with the codec of the recording"""
+        fourcc = cv2.VideoWriter_fourcc(*DataFormat.VIDEO_CODEC)
+        writer = cv2.VideoWriter(
+            output_path, fourcc, self.metadata["fps"], tuple(self.metadata["frame_size"])
+        )
+        if not writer.isOpened():
+            raise IOError(f"Could not open {output_path} for writing")
+        try:
+            count = 0
+            for _, image in self.iter_frames(start, stop):
+                writer.write(image)
+                count += 1
+        finally:
+            writer.release()
+        return count
+
+    def export_frames(self, output_dir, frame_numbers, extension=".png"):
+        """Write the annotated image of each frame to output_dir/frame_NNNNNN.png,
+        returns the written paths"""
+        os.makedirs(output_dir, exist_ok=True)
+
+        def export(frame_number):
+            path = os.path.join(output_dir, f"frame_{frame_number:06d}{extension}")
+            image = self._annotate(frame_number, self._thread_reader().get_frame(frame_number))
+            if not cv2.imwrite(path, image):
+                raise IOError(f"Could not write {path}")
+            return path
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(pool.map(export, frame_numbers))
+
+    def release(self):
+        with self._readers_lock:
+            for reader in self._readers:
+                reader.release()
+            self._readers = []
+
+
+def export_annotated_video(archive_path, output_path=None, workers=None):
+    """Render the annotated video of an archive, by default next to it as
+    <archive>_annotated.avi. Returns the output path."""
+    if output_path is None:
+        output_path = (
+            os.path.splitext(archive_path)[0] + "_annotated" + DataFormat.VIDEO_CODEC_EXTENSION
+        )
+    exporter = AnnotatedExporter(archive_path, workers)
+    try:
+        exporter.export_video(output_path)
+    finally:
+        exporter.release()
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the annotated video of an archive")
+    parser.add_argument("archive", help="Recorded .zip archive")
+    parser.add_argument("-o", "--output", help="Output video, or directory with --frames")
+    parser.add_argument(
+        "--frames", type=int, nargs="+", help="Export only these frames as images"
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.frames is None:
+        print(export_annotated_video(args.archive, args.output, args.workers))
+        return
+    exporter = AnnotatedExporter(args.archive, args.workers)
+    try:
+        output_dir = args.output or os.path.splitext(args.archive)[0] + "_annotated"
+        for path in exporter.export_frames(output_dir, args.frames):
+            print(path)
+    finally:
+        exporter.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# File: vision_track/lib/data_io/frame.py
+import cv2
+import numpy as np
+
+
+def to_bgr(frame):
+    """8-bit, 3 channel image of a Frame or a plain image (the image itself if
+    it already is one)"""
+    if hasattr(frame, "bgr"):
+        return frame.bgr
+    if frame.dtype != np.uint8:
+        frame = (frame * 255).astype(np.uint8)
+    if len(frame.shape) == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    elif frame.shape[2] == 4:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame
+
+
+class Frame:
+    """A captured image and the images derived from it.
+
+    Derived products (8-bit BGR, gray, downscaled versions, the display
+    overlay) are computed on first use and memoized, so every tracker and
+    stage working on the same frame shares them.
+    release() drops them once the frame has been fully processed.
+    """
+
+    def __init__(self, image, frame_number=None, timestamp=None):
+        self.image = image
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self._cache = {}
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def _memo(self, key, compute):
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+
+    @property
+    def bgr(self):
+        """8-bit, 3 channel version of the image (the image itself if it already is one)"""
+        return self._memo("bgr", lambda: to_bgr(self.image))
+
+    @property
+    def gray(self):
+        return self._memo("gray", self._to_gray)
+
+    def _to_gray(self):
+        if len(self.image.shape) == 2 and self.image.dtype == np.uint8:
+            return self.image
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+
+    def scaled(self, scale, gray=False):
+        """BGR (or gray) image resized by scale, INTER_AREA as for tracking"""
+        source = self.gray if gray else self.bgr
+        if scale == 1.0:
+            return source
+        return self._memo(
+            ("scaled", scale, gray),
+            lambda: cv2.resize(source, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA),
+        )
+
+    @property
+    def overlay(self):
+        """Copy of the BGR image to draw on, leaving the image itself clean"""
+        return self._memo("overlay", lambda: self.bgr.copy())
+
+    def release(self):
+        self._cache.clear()
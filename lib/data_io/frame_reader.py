@@ -0,0 +1,180 @@
+# File: vision_track/lib/data_io/frame_reader.py
+import io
+import shutil
+import struct
+import zipfile
+import cv2
+import numpy as np
+from .data_format import DataFormat
+from .archive import map_member, open_member_capture
+from .frame_store import FrameStore
+
+_CHUNK = struct.Struct("<4sI")
+_IDX1_ENTRY = struct.Struct("<4sIII")  # chunk id, flags, offset, size
+_AVIIF_KEYFRAME = 0x10
+
+
+def build_avi_index(data):
+    """Index the video frames of an AVI file (any buffer).
+
+    Walks the chunk headers of every RIFF segment (including OpenDML AVIX
+    extensions) without touching frame data. Returns a DataFormat.FRAME_INDEX_DTYPE
+    array with the byte offset and size of every frame of stream 0 and whether
+    it is a keyframe.
+    """
+    offsets, sizes = [], []
+    idx1 = None
+    pos = 0
+    while pos + 12 <= len(data):
+        riff_id, riff_size = _CHUNK.unpack_from(data, pos)
+        if riff_id != b"RIFF":
+            break
+        end = min(pos + 8 + riff_size, len(data))
+        chunk = pos + 12
+        while chunk + 8 <= end:
+            chunk_id, size = _CHUNK.unpack_from(data, chunk)
+            if chunk_id == b"LIST" and bytes(data[chunk + 8:chunk + 12]) == b"movi":
+                _walk_movi(data, chunk + 12, chunk + 8 + size, offsets, sizes)
+            elif chunk_id == b"idx1" and idx1 is None:
+                idx1 = (chunk + 8, size)
+            chunk += 8 + size + (size & 1)
+        pos = end + (end & 1)
+
+    index = np.zeros(len(offsets), dtype=DataFormat.FRAME_INDEX_DTYPE)
+    index["offset"] = offsets
+    index["size"] = sizes
+    # Intra-only codecs such as HuffYUV only have keyframes; the legacy index
+    # tells otherwise for the frames it covers.
+    index["keyframe"] = 1
+    if idx1 is not None:
+        start, size = idx1
+        entries = np.frombuffer(
+            data,
+            dtype=np.dtype([("id", "S4"), ("flags", "<u4"), ("offset", "<u4"), ("size", "<u4")]),
+            count=size // _IDX1_ENTRY.size,
+            offset=start,
+        )
+        flags = entries["flags"][np.isin(entries["id"], (b"00dc", b"00db"))]
+        covered = min(len(flags), len(index))
+        index["keyframe"][:covered] = (flags[:covered] & _AVIIF_KEYFRAME) != 0
+    return index
+
+
+def _walk_movi(data, pos, end, offsets, sizes):
+    while pos + 8 <= end:
+        chunk_id, size = _CHUNK.unpack_from(data, pos)
+        if chunk_id == b"LIST":
+            _walk_movi(data, pos + 12, pos + 8 + size, offsets, sizes)  # 'rec ' lists
+        elif chunk_id in (b"00dc", b"00db"):
+            offsets.append(pos + 8)
+            sizes.append(size)
+        pos += 8 + size + (size & 1)
+
+
+class FrameReader:
+    """Random access to the raw video frames of a recorded archive.
+
+    A frame index (byte offset, size and keyframe flag of every frame) is
+    built on first open and cached inside the archive as DataFormat.FRAME_INDEX,
+    so seeking to a frame only decodes from the closest preceding keyframe.
+    Archives with a chunked frame store instead of a raw video are read
+    through FrameStore, with no frame index.
+    """
+
+    def __init__(self, archive_path, cache_index=True):
+        self.archive_path = archive_path
+        self._zip = zipfile.ZipFile(archive_path, "r")
+        self.store = None
+        self.cap = None
+        self._temp_dir = None
+        if FrameStore.in_archive(self._zip):
+            self.store = FrameStore(archive_path)
+            self.index = None
+            return
+
+        self.index = self._load_index()
+        if self.index is None:
+            self.index = build_avi_index(
+                map_member(archive_path, self._zip, DataFormat.RAW_VIDEO)
+            )
+            if cache_index:
+                self._store_index()
+
+        # Closest keyframe at or before each frame
+        positions = np.where(self.index["keyframe"] != 0, np.arange(len(self.index)), 0)
+        self._keyframe_before = np.maximum.accumulate(positions) if len(positions) else positions
+
+        self.cap, self._temp_dir = open_member_capture(
+            archive_path, self._zip, DataFormat.RAW_VIDEO
+        )
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open {DataFormat.RAW_VIDEO} in {archive_path}")
+        self._next_frame = 0  # Frame the decoder returns on the next read
+
+    def _load_index(self):
+        if DataFormat.FRAME_INDEX not in self._zip.namelist():
+            return None
+        index = np.load(io.BytesIO(self._zip.read(DataFormat.FRAME_INDEX)))
+        video_size = self._zip.getinfo(DataFormat.RAW_VIDEO).file_size
+        if index.dtype != DataFormat.FRAME_INDEX_DTYPE or (
+            len(index) and int(index["offset"][-1]) + int(index["size"][-1]) > video_size
+        ):
+            return None  # Stale or foreign index, rebuild it
+        return index
+
+    def _store_index(self):
+        buffer = io.BytesIO()
+        np.save(buffer, self.index)
+        try:
+            with zipfile.ZipFile(self.archive_path, "a") as zipf:
+                if DataFormat.FRAME_INDEX not in zipf.namelist():
+                    zipf.writestr(DataFormat.FRAME_INDEX, buffer.getvalue())
+        except OSError as e:
+            print(f"Could not cache frame index in {self.archive_path}: {e}")
+
+    def __len__(self):
+        return len(self.store) if self.store is not None else len(self.index)
+
+    def get_frame(self, i):
+        if self.store is not None:
+            return self.store.get_frame(i)
+        if i < 0:
+            i += len(self.index)
+        if not 0 <= i < len(self.index):
+            raise IndexError(f"Frame {i} out of range (0-{len(self.index) - 1})")
+
+        keyframe = int(self._keyframe_before[i])
+        if not keyframe <= self._next_frame <= i:
+            # Reading forward from the current position would cross a keyframe
+            # (or go backwards), so seek instead
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            self._next_frame = keyframe
+        while self._next_frame < i:
+            if not self.cap.grab():
+                raise IOError(f"Failed to decode frame {self._next_frame}")
+            self._next_frame += 1
+
+        ret, frame = self.cap.read()
+        if not ret:
+            raise IOError(f"Failed to decode frame {i}")
+        self._next_frame = i + 1
+        return frame
+
+    def iter_frames(self, start=0, stop=None, step=1):
+        """Yield (frame_number, frame) for range(start, stop, step)"""
+        for i in range(*slice(start, stop, step).indices(len(self))):
+            yield i, self.get_frame(i)
+
+    def release(self):
+        if self.store is not None:
+            self.store.release()
+            self.store = None
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+        if self._zip:
+            self._zip.close()
+            self._zip = None
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
@@ -0,0 +1,257 @@
+# File: vision_track/lib/data_io/frame_store.py
+import json
+import mmap
+import os
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import cv2
+import numpy as np
+from .archive import member_data_offset
+from .data_format import DataFormat
+
+try:
+    import lz4.frame
+except ImportError:  # Optional, zlib is always available
+    lz4 = None
+
+
+def compress(data, codec, level):
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    if codec == "lz4":
+        if lz4 is None:
+            raise ValueError("The lz4 frame store codec needs the lz4 package")
+        return lz4.frame.compress(data, compression_level=level)
+    raise ValueError(f"Unknown frame store codec '{codec}'")
+
+
+def decompress(data, codec):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lz4":
+        if lz4 is None:
+            raise ValueError("The lz4 frame store codec needs the lz4 package")
+        return lz4.frame.decompress(data)
+    raise ValueError(f"Unknown frame store codec '{codec}'")
+
+
+class FrameStoreWriter:
+    """Write frames as a chunked frame store (see DataFormat.get_readme_content).
+
+    Every chunk_frames frames are compressed together into one member, so
+    chunks can be decoded independently and concurrently. Chunks are compressed
+    on a background thread, in order, and stored with write_member(name, data),
+    e.g. OutputHandler.add_file.
+    """
+
+    def __init__(self, write_member, chunk_frames=32, codec="zlib", level=3):
+        compress(b"", codec, level)  # Fail early on an unavailable codec
+        self.write_member = write_member
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.codec = codec
+        self.level = level
+        self.frame_shape = None
+        self.frame_count = 0
+        self.chunks = []
+        self._frames = []
+        self._compressor = ThreadPoolExecutor(1, thread_name_prefix="FrameStoreWriter")
+        self._pending = deque()
+
+    def write(self, frame):
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+        elif frame.shape != self.frame_shape:
+            raise ValueError(f"Frame of shape {frame.shape}, the store holds {self.frame_shape}")
+        self._frames.append(np.ascontiguousarray(frame, dtype=np.uint8))
+        self.frame_count += 1
+        if len(self._frames) == self.chunk_frames:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._frames:
+            return
+        name = DataFormat.FRAME_STORE_CHUNK.format(len(self.chunks))
+        self.chunks.append({"name": name, "frames": len(self._frames)})
+        self._pending.append(self._compressor.submit(self._store_chunk, name, self._frames))
+        self._frames = []
+        # Surface errors of finished chunks, keeping the compressor at most
+        # two chunks behind
+        while self._pending and (self._pending[0].done() or len(self._pending) > 2):
+            self._pending.popleft().result()
+
+    def _store_chunk(self, name, frames):
+        data = b"".join(frame.data for frame in frames)
+        self.write_member(name, compress(data, self.codec, self.level))
+
+    def close(self):
+        """Write the last partial chunk and the index"""
+        self._write_chunk()
+        self._compressor.shutdown()
+        while self._pending:
+            self._pending.popleft().result()
+        index = {
+            "frame_count": self.frame_count,
+            "chunk_frames": self.chunk_frames,
+            "frame_shape": list(self.frame_shape or ()),
+            "dtype": "uint8",
+            "codec": self.codec,
+            "chunks": self.chunks,
+        }
+        self.write_member(DataFormat.FRAME_STORE_INDEX, json.dumps(index))
+
+
+class FrameStore:
+    """Random and parallel access to the chunked frame store of an archive.
+
+    The last decoded chunk is kept, so reading frames in order decodes every
+    chunk once. iter_chunks decodes chunks concurrently in a process (or
+    thread) pool.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self._zip = zipfile.ZipFile(archive_path, "r")
+        self.index = json.loads(self._zip.read(DataFormat.FRAME_STORE_INDEX))
+        self.codec = self.index["codec"]
+        self.frame_shape = tuple(self.index["frame_shape"])
+        self.chunk_frames = self.index["chunk_frames"]
+        self._cached = (None, None)  # Chunk number and frames of the last decoded chunk
+        # Stored chunks are read from one memory map, located once here as
+        # worker threads must not seek the shared archive file
+        self._locations = [
+            member_data_offset(self._zip, entry["name"]) for entry in self.index["chunks"]
+        ]
+        with open(archive_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def in_archive(zip_file):
+        return DataFormat.FRAME_STORE_INDEX in zip_file.namelist()
+
+    def __len__(self):
+        return self.index["frame_count"]
+
+    @property
+    def chunk_count(self):
+        return len(self.index["chunks"])
+
+    def read_chunk(self, chunk):
+        """(frames, height, width, channels) array of all frames of a chunk"""
+        entry = self.index["chunks"][chunk]
+        location = self._locations[chunk]
+        if location is None:
+            data = decompress(self._zip.read(entry["name"]), self.codec)
+        else:
+            offset, size = location
+            with memoryview(self._map)[offset:offset + size] as compressed:
+                data = decompress(compressed, self.codec)
+        # Copied into a bytearray so the frames are writable like decoded video frames
+        frames = np.frombuffer(bytearray(data), dtype=np.uint8)
+        return frames.reshape((entry["frames"],) + self.frame_shape)
+
+    def get_frame(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Frame {i} out of range (0-{len(self) - 1})")
+        chunk = i // self.chunk_frames
+        if self._cached[0] != chunk:
+            self._cached = (chunk, self.read_chunk(chunk))
+        # A copy, callers may draw on the frame
+        return self._cached[1][i % self.chunk_frames].copy()
+
+    def iter_frames(self, start=0, stop=None, step=1):
+        """Yield (frame_number, frame) for range(start, stop, step)"""
+        for i in range(*slice(start, stop, step).indices(len(self))):
+            yield i, self.get_frame(i)
+
+    def iter_chunks(self, start=0, stop=None, workers=None, processes=True):
+        """Yield (first frame number, frames) of chunks [start, stop) in order,
+        decoded by workers processes (threads with processes=False), at most two
+        chunks per worker ahead of the consumer"""
+        start, stop, _ = slice(start, stop).indices(self.chunk_count)
+        chunks = iter(range(start, stop))
+        workers = workers or os.cpu_count() or 1
+        if processes:
+            pool = ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(self.archive_path,)
+            )
+            decode = _decode_chunk
+        else:
+            pool = ThreadPoolExecutor(workers)
+            decode = self.read_chunk
+        with pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, pool.submit(decode, chunk)))
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                chunk, future = pending.popleft()
+                frames = future.result()
+                next_chunk = next(chunks, None)
+                if next_chunk is not None:
+                    pending.append((next_chunk, pool.submit(decode, next_chunk)))
+                yield chunk * self.chunk_frames, frames
+
+    def release(self):
+        self._cached = (None, None)
+        if self._map:
+            self._map.close()
+            self._map = None
+        if self._zip:
+            self._zip.close()
+            self._zip = None
+
+
+# Frame store of a decoding process, opened once per process
+_worker_store = None
+
+
+def _init_worker(archive_path):
+    global _worker_store
+    _worker_store = FrameStore(archive_path)
+
+
+def _decode_chunk(chunk):
+    return _worker_store.read_chunk(chunk)
+
+
+class FrameStoreCapture:
+    """Sequential reads of a frame store through the cv2.VideoCapture methods
+    used by InputHandler, decoding the next chunks ahead on threads"""
+
+    def __init__(self, store, workers=2):
+        self.store = store
+        self._chunks = store.iter_chunks(workers=workers, processes=False)
+        self._frames = iter(())
+
+    def isOpened(self):
+        return self.store is not None
+
+    def read(self):
+        frame = next(self._frames, None)
+        if frame is None:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return False, None
+            self._frames = iter(chunk[1])
+            frame = next(self._frames)
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.store))
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.store.frame_shape[0])
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.store.frame_shape[1])
+        return 0.0
+
+    def release(self):
+        if self.store is not None:
+            self._chunks.close()
+            self.store.release()
+            self.store = None
@@ -3,22 +3,47 @@ import json
 import zipfile
 import os
 import time
+import queue
+import shutil
+import threading
+from collections import deque
 import numpy as np
-# from datetime import datetime
-# from .data_format import DataFormat
-# from data_io.data_format import DataFormat
-# from classic_CV.data_io.data_format import DataFormat
+from .data_format import DataFormat
+from .archive import ArchiveWriter, map_member, open_member_capture
+from .annotations import AnnotationIndex, AnnotationWriter, draw_annotations
+from .frame import to_bgr
+from .frame_store import FrameStore, FrameStoreCapture, FrameStoreWriter
 
 
 class InputHandler:
-    def __init__(self, source):
+    # Drop policies for threaded capture
+    DROP_LATEST = "latest"  # Consumer always gets the newest frame, stale ones are dropped
+    DROP_NONE = "lossless"  # Producer blocks until the consumer catches up
+
+    def __init__(self, source, threaded=False, queue_size=4, drop_policy=DROP_LATEST):
         self.source = source
         self.cap = None
         self.metadata = None
         self.roi_frame = None
         self._current_zip = None
+        self._temp_dir = None
         self.is_live_camera = False  # New flag to track input type
 
+        # Threaded capture state (see start_capture_thread)
+        if drop_policy not in (self.DROP_LATEST, self.DROP_NONE):
+            raise ValueError(f"Unknown drop policy '{drop_policy}'")
+        self.threaded = threaded
+        self.drop_policy = drop_policy
+        self.queue_size = max(1, int(queue_size))
+        self.dropped_frames = 0
+        self.captured_frames = 0
+        self.last_timestamp = None
+        self._frames = deque()
+        self._frames_cond = threading.Condition()
+        self._capture_thread = None
+        self._capture_running = False
+        self._capture_ended = False
+
         if isinstance(source, str) and source.endswith(".zip"):
             self._init_from_zip()
             self.is_live_camera = False
@@ -62,128 +87,317 @@ class InputHandler:
                 np.frombuffer(f.read(), dtype=np.uint8), cv2.IMREAD_COLOR
             )
 
-        # Initialize video readers
-        raw_video_data = self._current_zip.read(DataFormat.RAW_VIDEO)
-        self.cap = cv2.VideoCapture(
-            self._bytes_to_video(raw_video_data), cv2.CAP_FFMPEG
+        # Initialize video reader directly on the archive when possible
+        if FrameStore.in_archive(self._current_zip):
+            self.cap = FrameStoreCapture(FrameStore(self.source))
+        else:
+            self.cap, self._temp_dir = open_member_capture(
+                self.source, self._current_zip, DataFormat.RAW_VIDEO
+            )
+            if not self.cap.isOpened():
+                raise ValueError(f"Could not open {DataFormat.RAW_VIDEO} in {self.source}")
+
+        # Load annotations, version 2 records are used straight from the memory map
+        self.annotations = AnnotationIndex.from_bytes(
+            map_member(self.source, self._current_zip, DataFormat.ANNOTATIONS_BIN),
+            self.metadata.get("annotation_format_version", 1),
+        )
+
+    def start_capture_thread(self):
+        """Start the background producer thread that fills the frame queue"""
+        if self._capture_thread is not None or self.cap is None:
+            return
+        self._capture_running = True
+        self._capture_ended = False
+        self._capture_thread = threading.Thread(
+            target=self._capture_loop, name="InputHandlerCapture", daemon=True
         )
+        self._capture_thread.start()
 
-        # Load annotations
-        self.annotations = []
-        ann_data = self._current_zip.read(DataFormat.ANNOTATIONS_BIN)
-        offset = 0
-        while offset < len(ann_data):
-            # Read header
-            header = DataFormat.ANNOTATION_HEADER.unpack_from(ann_data, offset)
-            offset += DataFormat.ANNOTATION_HEADER.size
-            frame_num, num_ann = header
-
-            # Read annotations
-            frame_ann = []
-            for _ in range(num_ann):
-                ann = DataFormat.ANNOTATION_ITEM.unpack_from(ann_data, offset)
-                offset += DataFormat.ANNOTATION_ITEM.size
-                frame_ann.append({"bbox": ann[:4], "confidence": ann[4]})
-            self.annotations.append(frame_ann)
-
-    def _bytes_to_video(self, data):
-        # Helper to convert bytes to temporary video file
-        temp_path = f"temp_{DataFormat.RAW_VIDEO}"
-        with open(temp_path, "wb") as f:
-            f.write(data)
-        return temp_path
+    def stop_capture_thread(self):
+        if self._capture_thread is None:
+            return
+        with self._frames_cond:
+            self._capture_running = False
+            self._frames_cond.notify_all()
+        self._capture_thread.join()
+        self._capture_thread = None
+
+    def _capture_loop(self):
+        while self._capture_running:
+            ret, frame = self.cap.read()
+            timestamp = time.time()
+            with self._frames_cond:
+                if not ret:
+                    self._capture_ended = True
+                    self._frames_cond.notify_all()
+                    return
+                self.captured_frames += 1
+                if self.drop_policy == self.DROP_NONE:
+                    while len(self._frames) >= self.queue_size and self._capture_running:
+                        self._frames_cond.wait()
+                    if not self._capture_running:
+                        return
+                elif len(self._frames) >= self.queue_size:
+                    self._frames.popleft()
+                    self.dropped_frames += 1
+                self._frames.append((frame, timestamp))
+                self._frames_cond.notify_all()
+
+    def _fetch_queued_frame(self):
+        if self._capture_thread is None:
+            self.start_capture_thread()
+
+        with self._frames_cond:
+            while not self._frames and not self._capture_ended:
+                self._frames_cond.wait()
+            if not self._frames:
+                return None, None
+
+            if self.drop_policy == self.DROP_LATEST:
+                # Everything older than the newest frame is stale
+                self.dropped_frames += len(self._frames) - 1
+                frame, timestamp = self._frames.pop()
+                self._frames.clear()
+            else:
+                frame, timestamp = self._frames.popleft()
+            self._frames_cond.notify_all()
+        return frame, timestamp
 
     def fetch_frame(self):
         if self.cap is None:
             return None, False
 
+        if self.threaded:
+            frame, timestamp = self._fetch_queued_frame()
+            if frame is None:
+                return None, False
+            self.last_timestamp = timestamp
+            return frame, True
+
         ret, frame = self.cap.read()
         if not ret:
             return None, False
 
+        self.captured_frames += 1
+        self.last_timestamp = time.time()
         return frame, True
 
+    @property
+    def queue_depth(self):
+        with self._frames_cond:
+            return len(self._frames)
+
+    def get_capture_stats(self):
+        return {
+            "captured_frames": self.captured_frames,
+            "dropped_frames": self.dropped_frames,
+            "queue_depth": self.queue_depth,
+            "queue_size": self.queue_size,
+            "drop_policy": self.drop_policy,
+        }
+
     def get_annotations(self, frame_number):
-        if frame_number < len(self.annotations):
-            return self.annotations[frame_number]
-        return []
+        """Annotations of a frame as a view into a DataFormat.ANNOTATION_DTYPE array"""
+        return self.annotations.get(frame_number)
 
     def get_metadata(self):
         return self.metadata.copy()
 
     def release(self):
+        self.stop_capture_thread()
         if self.cap:
             self.cap.release()
         if self._current_zip:
             self._current_zip.close()
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+
+def tracked_annotations(tracked, confidences):
+    """Annotations for OutputHandler.write_frame from the {object_id: bbox}
+    result of a tracker update and the tracker's confidences (1.0 if missing)"""
+    return [
+        {"bbox": bbox, "confidence": confidences.get(obj_id, 1.0), "object_id": obj_id}
+        for obj_id, bbox in tracked.items()
+    ]
 
 
 class OutputHandler:
-    def __init__(self, output_path, fps, frame_size):
+    def __init__(
+        self,
+        output_path,
+        fps,
+        frame_size,
+        async_writers=False,
+        queue_size=8,
+        annotation_version=DataFormat.ANNOTATION_FORMAT_VERSION,
+        render_annotated=False,
+        frame_store=None,
+        log_handler=None,
+    ):
         self.output_path = output_path
         self.fps = fps
         self.frame_size = frame_size
         self.frame_count = 0
         self.roi_frame = None
         self.roi_info = None
-
-        # Temporary files
+        self.async_writers = async_writers
+        self.queue_size = max(1, int(queue_size))
+        self._workers = {}
+        self._worker_error = None
+        # The annotated video is derived from the raw video and annotations by
+        # default (see export.py) and only encoded live when asked for
+        self.render_annotated = render_annotated
+        # Handler with get_contents() whose log is stored as console.log
+        self.log_handler = log_handler
+        self.extra_metadata = {}  # Additional metadata entries, e.g. "segment"
+
+        # Members are written straight into the archive. Only the videos, which
+        # cv2.VideoWriter writes to a path, and the annotations, which survive
+        # an interrupted recording this way, go through temporary files.
+        self.archive = ArchiveWriter(output_path)
         self.temp_files = {
-            DataFormat.RAW_VIDEO: f"{output_path}_temp_{DataFormat.RAW_VIDEO}",
-            DataFormat.ANNOTATED_VIDEO: f"{output_path}_temp_{DataFormat.ANNOTATED_VIDEO}",
             DataFormat.ANNOTATIONS_BIN: f"{output_path}_temp_{DataFormat.ANNOTATIONS_BIN}",
-            DataFormat.METADATA_JSON: f"{output_path}_temp_{DataFormat.METADATA_JSON}",
-            DataFormat.ROI_FRAME: f"{output_path}_temp_{DataFormat.ROI_FRAME}",
         }
 
-        # Initialize video writers
+        # Raw frames go to a chunked frame store when frame_store is True or a
+        # dict of FrameStoreWriter options, to the raw video otherwise
         fourcc = cv2.VideoWriter_fourcc(*DataFormat.VIDEO_CODEC)
-        self.raw_writer = cv2.VideoWriter(
-            self.temp_files[DataFormat.RAW_VIDEO], fourcc, fps, frame_size
-        )
-        self.annotated_writer = cv2.VideoWriter(
-            self.temp_files[DataFormat.ANNOTATED_VIDEO], fourcc, fps, frame_size
-        )
+        self.raw_writer = None
+        self.frame_store = None
+        if frame_store:
+            options = frame_store if isinstance(frame_store, dict) else {}
+            self.frame_store = FrameStoreWriter(self.add_file, **options)
+        else:
+            self.temp_files[DataFormat.RAW_VIDEO] = f"{output_path}_temp_{DataFormat.RAW_VIDEO}"
+            self.raw_writer = cv2.VideoWriter(
+                self.temp_files[DataFormat.RAW_VIDEO], fourcc, fps, frame_size
+            )
+        self.annotated_writer = None
+        if render_annotated:
+            self.temp_files[DataFormat.ANNOTATED_VIDEO] = (
+                f"{output_path}_temp_{DataFormat.ANNOTATED_VIDEO}"
+            )
+            self.annotated_writer = cv2.VideoWriter(
+                self.temp_files[DataFormat.ANNOTATED_VIDEO], fourcc, fps, frame_size
+            )
 
         # Open annotation file
+        self.annotation_version = annotation_version
         self.annotation_file = open(self.temp_files[DataFormat.ANNOTATIONS_BIN], "wb")
+        self.annotation_writer = AnnotationWriter(self.annotation_file, annotation_version)
+
+        if self.async_writers:
+            self._start_workers()
+
+    def _start_workers(self):
+        # One worker per output stream, each fed in frame order by its own bounded
+        # queue. A full queue blocks write_frame, which is the backpressure.
+        streams = {"raw": self._write_raw, "annotations": self._write_annotations}
+        if self.render_annotated:
+            streams["annotated"] = self._write_annotated
+        for name, write in streams.items():
+            frames = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(frames, write),
+                name=f"OutputHandler-{name}",
+                daemon=True,
+            )
+            self._workers[name] = (thread, frames)
+            thread.start()
+
+    def _worker_loop(self, frames, write):
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            if self._worker_error is not None:
+                continue  # Keep draining so write_frame never blocks forever
+            try:
+                write(*item)
+            except Exception as e:
+                self._worker_error = e
+
+    def _stop_workers(self):
+        for thread, frames in self._workers.values():
+            frames.put(None)
+        for thread, frames in self._workers.values():
+            thread.join()
+        self._workers = {}
+
+    def _raise_worker_error(self):
+        if self._worker_error is not None:
+            error, self._worker_error = self._worker_error, None
+            raise RuntimeError(f"Output writer failed: {error}") from error
+
+    def _write_raw(self, frame_number, frame, annotations, timestamp_ns):
+        if self.frame_store is not None:
+            self.frame_store.write(frame)
+        else:
+            self.raw_writer.write(frame)
 
-    def write_frame(self, frame, annotations):
-        # Write raw frame
-        self.raw_writer.write(frame)
-        
-        # Write annotated frame
-        annotated_frame = frame.copy()
-        for ann in annotations:
-            x, y, w, h = map(int, ann['bbox'])
-            cv2.rectangle(annotated_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(annotated_frame, f"{ann['confidence']:.2f}", 
-                       (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
+    def _write_annotated(self, frame_number, frame, annotations, timestamp_ns):
+        annotated_frame = draw_annotations(
+            frame.copy(),
+            [ann["bbox"] for ann in annotations],
+            [ann["confidence"] for ann in annotations],
+        )
         self.annotated_writer.write(annotated_frame)
-        
-        # Write binary annotations
-        header = DataFormat.ANNOTATION_HEADER.pack(self.frame_count, len(annotations))
-        self.annotation_file.write(header)
-        for ann in annotations:
-            data = (*ann['bbox'], ann['confidence'])
-            self.annotation_file.write(DataFormat.ANNOTATION_ITEM.pack(*data))
-        
+
+    def _write_annotations(self, frame_number, frame, annotations, timestamp_ns):
+        self.annotation_writer.write_frame(frame_number, annotations, timestamp_ns)
+
+    def write_frame(self, frame, annotations, timestamp=None):
+        """Record a frame. Each annotation is a dict with 'bbox', 'confidence' and
+        optionally 'object_id'; timestamp is the capture time in seconds since the
+        epoch (defaults to now). frame may be an image or a Frame, whose
+        unannotated BGR image is recorded."""
+        frame = to_bgr(frame)
+        if timestamp is None:
+            timestamp_ns = time.time_ns()
+        else:
+            timestamp_ns = int(timestamp * 1e9)
+
+        if self.async_writers:
+            # The frame is shared by the workers and must not be modified by the
+            # caller after this point.
+            self._raise_worker_error()
+            item = (self.frame_count, frame, list(annotations), timestamp_ns)
+            for thread, frames in self._workers.values():
+                frames.put(item)
+        else:
+            self._write_raw(self.frame_count, frame, annotations, timestamp_ns)
+            if self.render_annotated:
+                self._write_annotated(self.frame_count, frame, annotations, timestamp_ns)
+            self._write_annotations(self.frame_count, frame, annotations, timestamp_ns)
+
         self.frame_count += 1
 
+    def get_queue_depths(self):
+        return {name: frames.qsize() for name, (thread, frames) in self._workers.items()}
+
     def set_roi(self, frame, roi):
-        self.roi_frame = frame
+        self.roi_frame = to_bgr(frame)
         self.roi_info = roi
 
     def add_file(self, filename, content):
-            with open(f"{self.output_path}_temp_{filename}", 'w') as f:
-                f.write(content)
-            self.temp_files[filename] = f"{self.output_path}_temp_{filename}"
+        """Add a member (text or bytes) to the archive, filename may be a path
+        within the archive"""
+        self.archive.writestr(filename, content)
+
+    def add_run_file(self, filename, content):
+        """Add a file describing the whole run, e.g. its profile; a member of
+        the archive like add_file"""
+        self.add_file(filename, content)
 
     def finalize(self):
-        # Release video writers
-        self.raw_writer.release()
-        self.annotated_writer.release()
-        self.annotation_file.close()
+        # Drain the writer queues before releasing the writers
+        self._stop_workers()
+        self._raise_worker_error()
+        self._release_writers()
 
         # Create metadata
         metadata = {
@@ -192,31 +406,245 @@ class OutputHandler:
             "frame_size": self.frame_size,
             "roi": self.roi_info,
         }
-        with open(self.temp_files[DataFormat.METADATA_JSON], "w") as f:
-            json.dump(metadata, f)
+        if self.annotation_version != 1:
+            metadata["annotation_format_version"] = self.annotation_version
+        if not self.render_annotated:
+            metadata["annotated_video"] = DataFormat.ANNOTATED_VIDEO_DERIVED
+        metadata.update(self.extra_metadata)
+        self.archive.writestr(DataFormat.METADATA_JSON, json.dumps(metadata))
 
         # Save ROI frame
-        cv2.imwrite(self.temp_files[DataFormat.ROI_FRAME], self.roi_frame)
-
-        # Create ZIP archive
-        with zipfile.ZipFile(self.output_path, "w") as zipf:
-            # Add all components
-            for arcname, temp_path in self.temp_files.items():
-                if os.path.exists(temp_path):
-                    zipf.write(temp_path, arcname=arcname)
+        ok, png = cv2.imencode(".png", self.roi_frame)
+        if ok:
+            self.archive.writestr(DataFormat.ROI_FRAME, png.tobytes())
 
-            # Add README
-            zipf.writestr(DataFormat.README, DataFormat.get_readme_content())
+        if self.log_handler is not None:
+            self.add_file(DataFormat.CONSOLE_LOG, self.log_handler.get_contents())
 
-        # Cleanup temporary files
-        for temp_path in self.temp_files.values():
+        # Move the temporary files in and close the archive
+        for arcname, temp_path in self.temp_files.items():
             if os.path.exists(temp_path):
-                os.remove(temp_path)
+                self.archive.move_file(arcname, temp_path)
+        self.archive.writestr(DataFormat.README, DataFormat.get_readme_content())
+        self.archive.close()
+
+    def _release_writers(self):
+        if self.frame_store is not None:
+            self.frame_store.close()
+        else:
+            self.raw_writer.release()
+        if self.annotated_writer:
+            self.annotated_writer.release()
+        self.annotation_writer.close()
+
+    def discard(self):
+        """Stop recording and delete the archive and temporary files, for a
+        recording that never got to track anything"""
+        self._stop_workers()
+        self._worker_error = None
+        self._release_writers()
+        self.archive.close()
+        for path in [self.output_path, *self.temp_files.values()]:
+            if os.path.exists(path):
+                os.remove(path)
 
     def __del__(self):
-        if hasattr(self, "raw_writer"):
+        if getattr(self, "_workers", None):
+            self._stop_workers()
+        if getattr(self, "raw_writer", None):
             self.raw_writer.release()
-        if hasattr(self, "annotated_writer"):
+        if getattr(self, "annotated_writer", None):
             self.annotated_writer.release()
         if hasattr(self, "annotation_file"):
-            self.annotation_file.close()
\ No newline at end of file
+            self.annotation_file.close()
+        if hasattr(self, "archive"):
+            self.archive.close()
+
+
+class SegmentedOutputHandler:
+    """Rolling recording split into self-contained segment archives.
+
+    A new segment archive, <output>_NNNNN.zip, is started every segment_frames
+    frames and/or every segment_seconds seconds of capture time. Each segment
+    has its own metadata and annotations (frame numbers restart at 0) and as
+    ROI the boxes of its first frame (the last known ROI and its frame if
+    nothing is tracked there), so it can be re-tracked or exported on its
+    own. The profile of the whole run goes next to the segments, see
+    add_run_file. Finished segments are finalized on a background thread while
+    recording continues, so a crash only loses the segment being recorded and
+    at most one segment still being finalized. The
+    log_handler (with read_since()) gives every segment the log lines emitted
+    while it was recorded. Other options are passed to each segment's
+    OutputHandler.
+    """
+
+    def __init__(
+        self,
+        output_path,
+        fps,
+        frame_size,
+        segment_frames=None,
+        segment_seconds=None,
+        log_handler=None,
+        **options,
+    ):
+        if not segment_frames and not segment_seconds:
+            raise ValueError("Segmented recording needs segment_frames or segment_seconds")
+        self._base_path = output_path[:-4] if output_path.endswith(".zip") else output_path
+        self.output_path = f"{self._base_path}_*.zip"  # Pattern of the segment paths
+        self.fps = fps
+        self.frame_size = frame_size
+        self.segment_frames = segment_frames
+        self.segment_seconds = segment_seconds
+        self.log_handler = log_handler
+        self.options = options
+        self.frame_count = 0
+        self.roi_frame = None
+        self.roi_info = None
+        self.segments = []  # Paths of the finalized segments
+        self._segment = None
+        self._segment_index = 0
+        self._segment_start = None
+        self._log_position = 0  # The first segment gets the log from the start
+        self._files = {}  # Files added before the first segment was started
+        self._finalizer = None
+        self._finalizer_error = None
+
+    def set_roi(self, frame, roi):
+        # ROI of the first segment, the later ones start from the tracked boxes
+        self.roi_frame = to_bgr(frame)
+        self.roi_info = roi
+        if self._segment is not None:
+            self._segment.set_roi(frame, roi)
+
+    def write_frame(self, frame, annotations, timestamp=None):
+        """Record a frame, see OutputHandler.write_frame. Starts a new segment
+        first when the current one is full."""
+        self._raise_finalizer_error()
+        now = timestamp if timestamp is not None else time.time()
+        if self._segment is not None and (
+            (self.segment_frames and self._segment.frame_count >= self.segment_frames)
+            or (self.segment_seconds and now - self._segment_start >= self.segment_seconds)
+        ):
+            self._close_segment(background=True)
+        if self._segment is None:
+            self._start_segment(frame, annotations, now)
+        self._segment.write_frame(frame, annotations, timestamp)
+        self.frame_count += 1
+
+    def _start_segment(self, frame, annotations, start_time):
+        path = f"{self._base_path}_{self._segment_index:05d}.zip"
+        segment = OutputHandler(path, self.fps, self.frame_size, **self.options)
+        segment.extra_metadata["segment"] = {
+            "index": self._segment_index,
+            "first_frame": self.frame_count,
+            "start_time": start_time,
+        }
+        boxes = [tuple(ann["bbox"]) for ann in annotations]
+        # The first segment keeps the ROI given to set_roi. Without tracked
+        # boxes in its first frame a segment keeps the last known ROI together
+        # with the frame it was found in.
+        if self.roi_frame is None or (boxes and self._segment_index > 0):
+            self.roi_frame = to_bgr(frame)
+            if boxes:
+                self.roi_info = boxes[0] if len(boxes) == 1 else boxes
+        segment.set_roi(self.roi_frame, self.roi_info)
+        for filename, content in self._files.items():
+            segment.add_file(filename, content)
+        self._files = {}
+        self._segment = segment
+        self._segment_index += 1
+        self._segment_start = start_time
+
+    def _close_segment(self, background):
+        segment, self._segment = self._segment, None
+        if self.log_handler is not None:
+            log, self._log_position = self.log_handler.read_since(self._log_position)
+            segment.add_file(DataFormat.CONSOLE_LOG, log)
+        # At most one segment is finalized at a time, which bounds the memory
+        # and temporary files held by finished segments
+        self._wait_finalizer()
+        if background:
+            self._finalizer = threading.Thread(
+                target=self._finalize_segment,
+                args=(segment,),
+                name="SegmentedOutputHandler-finalize",
+                daemon=True,
+            )
+            self._finalizer.start()
+        else:
+            self._finalize_segment(segment)
+
+    def _finalize_segment(self, segment):
+        try:
+            segment.finalize()
+        except Exception as e:
+            self._finalizer_error = e
+            return
+        self.segments.append(segment.output_path)
+        print(f"Segment saved to {segment.output_path}")
+
+    def _wait_finalizer(self):
+        if self._finalizer is not None:
+            self._finalizer.join()
+            self._finalizer = None
+
+    def _raise_finalizer_error(self):
+        if self._finalizer_error is not None:
+            error, self._finalizer_error = self._finalizer_error, None
+            raise RuntimeError(f"Segment finalize failed: {error}") from error
+
+    def get_queue_depths(self):
+        return self._segment.get_queue_depths() if self._segment is not None else {}
+
+    def add_file(self, filename, content):
+        """Add a member to the current segment (the next one if none is open)"""
+        if self._segment is not None:
+            self._segment.add_file(filename, content)
+        else:
+            self._files[filename] = content
+
+    def add_run_file(self, filename, content):
+        """Write a file describing the whole run next to the segments, as
+        <output>_<filename>"""
+        mode = "wb" if isinstance(content, bytes) else "w"
+        with open(f"{self._base_path}_{filename}", mode) as f:
+            f.write(content)
+
+    def finalize(self):
+        if self._segment is not None:
+            self._close_segment(background=False)
+        self._wait_finalizer()
+        self._raise_finalizer_error()
+
+    def discard(self):
+        """Discard the segment being recorded, finished segments are kept"""
+        if self._segment is not None:
+            segment, self._segment = self._segment, None
+            segment.discard()
+        self._wait_finalizer()
+
+
+def create_output_handler(config, output_path, fps, frame_size, log_handler=None):
+    """Output handler for the recording options of a configuration, segmented
+    when "segment_frames" or "segment_seconds" is set"""
+    options = dict(
+        async_writers=config.get("async_recording", False),
+        queue_size=config.get("recording_queue_size", 8),
+        annotation_version=config.get(
+            "annotation_format_version", DataFormat.ANNOTATION_FORMAT_VERSION
+        ),
+        render_annotated=config.get("render_annotated", False),
+        frame_store=config.get("frame_store"),
+    )
+    if config.get("segment_frames") or config.get("segment_seconds"):
+        return SegmentedOutputHandler(
+            output_path,
+            fps,
+            frame_size,
+            segment_frames=config.get("segment_frames"),
+            segment_seconds=config.get("segment_seconds"),
+            log_handler=log_handler,
+            **options,
+        )
+    return OutputHandler(output_path, fps, frame_size, log_handler=log_handler, **options)
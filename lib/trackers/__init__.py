@@ -1,21 +1,120 @@
 # lib/trackers/__init__.py
+import ast
 import importlib
+import json
 import os
 
-# Dynamically import all tracker modules
-tracker_modules = {}
-for filename in os.listdir(os.path.dirname(__file__)):
-    if filename.endswith(".py") and filename != "__init__.py":
-        module_name = filename[:-3]  # Remove .py extension
-        tracker_modules[module_name] = importlib.import_module(
-            f"vision_track.lib.trackers.{module_name}", package="vision_track.lib"
+# Third-party packages register trackers under this entry point group, e.g.
+#   [project.entry-points."vision_track.trackers"]
+#   MyTracker = "my_package.my_module:MyTracker"
+ENTRY_POINT_GROUP = "vision_track.trackers"
+BASE_CLASS = "TrackingAlgorithmBase"
+
+_modules = None  # tracker name -> module of this package, scanned on first use
+_entry_point_trackers = None  # tracker name -> entry point, read only when needed
+_loaded = {}  # tracker name -> class
+
+
+def _module_files():
+    directory = os.path.dirname(__file__)
+    return sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith(".py") and filename != "__init__.py"
+    )
+
+
+def _scan_modules(paths):
+    """Find the tracker classes of this package without importing them.
+
+    Parses every module and follows the class bases within the package:
+    a class is a tracker if it derives from TrackingAlgorithmBase.
+    """
+    bases, modules = {}, {}
+    for path in paths:
+        filename = os.path.basename(path)
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename)
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                bases[node.name] = [
+                    base.id if isinstance(base, ast.Name) else getattr(base, "attr", None)
+                    for base in node.bases
+                ]
+                modules[node.name] = filename[:-3]
+
+    def is_tracker(name, seen=()):
+        if name == BASE_CLASS:
+            return True
+        return name in bases and name not in seen and any(
+            is_tracker(base, seen + (name,)) for base in bases[name]
         )
 
+    return {
+        name: module
+        for name, module in modules.items()
+        if name != BASE_CLASS and is_tracker(name)
+    }
+
+
+def _local_trackers():
+    # The scan is cached next to the bytecode and redone when any module changes
+    global _modules
+    if _modules is None:
+        paths = _module_files()
+        stamp = [[os.path.basename(p), os.stat(p).st_mtime_ns, os.stat(p).st_size] for p in paths]
+        cache = os.path.join(os.path.dirname(__file__), "__pycache__", "tracker_registry.json")
+        try:
+            with open(cache) as f:
+                cached = json.load(f)
+            if cached["stamp"] == stamp:
+                _modules = cached["trackers"]
+        except (OSError, ValueError, KeyError):
+            pass
+        if _modules is None:
+            _modules = _scan_modules(paths)
+            try:
+                os.makedirs(os.path.dirname(cache), exist_ok=True)
+                with open(cache, "w") as f:
+                    json.dump({"stamp": stamp, "trackers": _modules}, f)
+            except OSError:
+                pass  # Read-only install, scan again next time
+    return _modules
+
+
+def _third_party_trackers():
+    global _entry_point_trackers
+    if _entry_point_trackers is None:
+        from importlib import metadata
+
+        try:
+            entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:  # Python < 3.10
+            entry_points = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+        _entry_point_trackers = {ep.name: ep for ep in entry_points}
+    return _entry_point_trackers
+
+
 def get_tracker(tracker_name):
-    for module in tracker_modules.values():
-        if hasattr(module, tracker_name):
-            return getattr(module, tracker_name)
-    raise ValueError(f"Tracker '{tracker_name}' not found")
+    """Return the tracker class of that name, importing only its module"""
+    if tracker_name in _loaded:
+        return _loaded[tracker_name]
+    # Trackers of this package take precedence over third-party ones
+    module = _local_trackers().get(tracker_name)
+    if module is not None:
+        tracker_class = getattr(importlib.import_module(f"{__name__}.{module}"), tracker_name)
+    elif tracker_name in _third_party_trackers():
+        tracker_class = _third_party_trackers()[tracker_name].load()
+    else:
+        raise ValueError(f"Tracker '{tracker_name}' not found")
+    _loaded[tracker_name] = tracker_class
+    return tracker_class
+
+
+def available_trackers():
+    """Names of all tracker classes that get_tracker can return"""
+    return sorted(set(_local_trackers()) | set(_third_party_trackers()))
+
 
-# Explicitly export the get_tracker function
-__all__ = ["get_tracker"]
+# Explicitly export the tracker lookup functions
+__all__ = ["get_tracker", "available_trackers"]
@@ -1,15 +1,67 @@
 # trackers/base.py
 
+import time
 import cv2
 import numpy as np
+from .multi_tracker import ParallelMultiTracker
+
+try:
+    from ..data_io.frame import to_bgr
+except ImportError:  # trackers imported as a top-level package, with lib on sys.path
+    from data_io.frame import to_bgr
 
 
 class TrackingAlgorithmBase:
-    def __init__(self):
-        self.trackers = cv2.legacy.MultiTracker_create()
+    # Resolution policy for the automatic mode: scale the frame by 1/n so the
+    # smallest target side stays at least AUTO_TARGET_SIZE pixels, but never
+    # below MIN_SCALE
+    AUTO_TARGET_SIZE = 48
+    MIN_SCALE = 0.125
+
+    def __init__(
+        self,
+        workers=None,
+        scale=1.0,
+        target_size=AUTO_TARGET_SIZE,
+        reacquire_budget_ms=5.0,
+        reacquire_threshold=0.6,
+        max_lost=30,
+        search_growth=0.5,
+    ):
+        # Every object gets its own tracker so success is known per object.
+        # workers=None updates them serially, otherwise on a thread pool of
+        # that size (0 means one thread per CPU).
+        self.trackers = ParallelMultiTracker(1 if workers is None else workers)
         self.object_ids = []
         self.next_object_id = 0
 
+        # Resolution policy: track on frames resized by self.scale. "auto" picks
+        # the factor from the initial boxes so the smallest one keeps at least
+        # target_size px.
+        if scale != "auto" and not 0 < float(scale) <= 1:
+            raise ValueError(f"Scale must be in (0, 1] or 'auto', got {scale}")
+        self.scale_policy = scale
+        self.target_size = target_size
+        self.scale = 1.0 if scale == "auto" else float(scale)
+        self._update_time = 0.0
+        self._update_count = 0
+
+        # Per-object state: confidence of the last update (only 1.0 tracked or
+        # 0.0 lost here, subclasses may report a score), frames since an
+        # object was lost, and the template it is searched for with
+        self.confidences = {}
+        self.lost = {}
+        self.reacquire_templates = {}
+        # Re-acquisition searches a window around the last known box that grows
+        # by search_growth box sizes per lost frame, within a per-frame time
+        # budget. Objects lost for more than max_lost frames are removed.
+        self.reacquire_budget_ms = reacquire_budget_ms
+        self.reacquire_threshold = reacquire_threshold
+        self.max_lost = max_lost
+        self.search_growth = search_growth
+        self.reacquisitions = 0
+        self._reacquire_cursor = 0
+
         self.zoom_factor = 1.0
         self.offset_x = 0
         self.offset_y = 0
@@ -128,8 +180,15 @@ class TrackingAlgorithmBase:
 
 
     def initialize(self, frame, bounding_boxes):
-        frame = self._ensure_bgr(frame)
-        print(f"Frame type: {frame.dtype}, shape: {frame.shape}")
+        full_frame = to_bgr(frame)
+        print(f"Frame type: {full_frame.dtype}, shape: {full_frame.shape}")
+
+        if self.scale_policy == "auto":
+            self.scale = self._auto_scale(bounding_boxes)
+        if self.scale != 1.0:
+            print(f"Tracking at scale {self.scale:.3f}")
+        tracking_frame = self._tracking_frame(frame)
+        gray = self._tracking_gray(frame, tracking_frame)
 
         initialization_successful = False
         for bbox in bounding_boxes:
@@ -141,19 +200,19 @@ class TrackingAlgorithmBase:
                 or h <= 0
                 or x < 0
                 or y < 0
-                or x + w > frame.shape[1]
-                or y + h > frame.shape[0]
+                or x + w > full_frame.shape[1]
+                or y + h > full_frame.shape[0]
             ):
                 print("Invalid bounding box: out of bounds or negative dimensions.")
                 continue
 
             tracker = self._create_tracker()
             try:
-                success = self.trackers.add(tracker, frame, (x, y, w, h))
+                box = self._to_tracking((x, y, w, h))
+                success = self.trackers.add(tracker, tracking_frame, box)
                 print(f"Tracker add success: {success}")
                 if success:
-                    self.object_ids.append(self.next_object_id)
-                    self.next_object_id += 1
+                    self._register_object(gray, box)
                     initialization_successful = True
             except Exception as e:
                 print(f"Error adding tracker: {e}")
@@ -164,50 +223,214 @@ class TrackingAlgorithmBase:
         return initialization_successful
 
     def update(self, frame):
-        frame = self._ensure_bgr(frame)
-        success, boxes = self.trackers.update(frame)
+        start = time.perf_counter()
+        tracking_frame = self._tracking_frame(frame)
+        _, boxes = self.trackers.update(tracking_frame)
         tracked_objects = {}
 
-        if success:
-            for i, box in enumerate(boxes):
-                x, y, w, h = [int(v) for v in box]
-                tracked_objects[self.object_ids[i]] = (x, y, w, h)
+        # Objects whose tracker failed are reported as lost, the others are
+        # not affected
+        for i, object_id in enumerate(self.object_ids):
+            if self.trackers.successes[i]:
+                self.lost.pop(object_id, None)
+                self.confidences[object_id] = 1.0
+                tracked_objects[object_id] = self._from_tracking(boxes[i])
+            else:
+                self.lost[object_id] = self.lost.get(object_id, 0) + 1
+                self.confidences[object_id] = 0.0
+
+        if self.lost:
+            tracked_objects.update(self.handle_disappearance(frame, tracking_frame))
 
+        self._update_time += time.perf_counter() - start
+        self._update_count += 1
         return tracked_objects
 
     def add_object(self, frame, bounding_box):
         tracker = self._create_tracker()
-        success = self.trackers.add(tracker, frame, tuple(bounding_box))
+        tracking_frame = self._tracking_frame(frame)
+        box = self._to_tracking(bounding_box)
+        success = self.trackers.add(tracker, tracking_frame, box)
         if success:
-            self.object_ids.append(self.next_object_id)
-            self.next_object_id += 1
+            self._register_object(self._tracking_gray(frame, tracking_frame), box)
         return success
 
+    def _register_object(self, gray, box):
+        object_id = self.next_object_id
+        self.object_ids.append(object_id)
+        self.next_object_id += 1
+        self.confidences[object_id] = 1.0
+        template = self._crop(gray, box)
+        if template is not None:
+            self.reacquire_templates[object_id] = template.copy()
+        return object_id
+
     def remove_object(self, object_id):
         if object_id in self.object_ids:
             index = self.object_ids.index(object_id)
             del self.object_ids[index]
-            print(f"Object ID {object_id} removed. Reinitialization required.")
-
-    def handle_disappearance(self):
-        # Placeholder implementation
-        pass
+            self.trackers.remove(index)
+            self.confidences.pop(object_id, None)
+            self.lost.pop(object_id, None)
+            self.reacquire_templates.pop(object_id, None)
+            print(f"Object ID {object_id} removed.")
+
+    def handle_disappearance(self, frame, tracking_frame=None):
+        """Search for lost objects around their last known position.
+
+        Lost objects are searched round-robin until reacquire_budget_ms is used
+        up. Re-acquired objects get a new tracker; a match found after the
+        budget ran out is left for the next frame, which starts with that
+        object. Only the first object of a frame is always searched and
+        re-initialized, so a frame can overrun the budget by at most one
+        search (bounded by REACQUIRE_MAX_PIXELS) and one tracker init.
+        Objects lost for more than max_lost frames are removed. Returns
+        {object_id: bbox} of the re-acquired objects.
+        """
+        deadline = time.perf_counter() + self.reacquire_budget_ms / 1000
+        for object_id in [oid for oid, frames in self.lost.items() if frames > self.max_lost]:
+            print(f"Object ID {object_id} lost for {self.lost[object_id]} frames.")
+            self.remove_object(object_id)
+        if not self.lost:
+            return {}
+
+        if tracking_frame is None:
+            tracking_frame = self._tracking_frame(frame)
+        gray = self._tracking_gray(frame, tracking_frame)
+
+        lost = list(self.lost)
+        start = self._reacquire_cursor = (self._reacquire_cursor + 1) % len(lost)
+        lost = lost[start:] + lost[:start]
+
+        reacquired = {}
+        for position, object_id in enumerate(lost):
+            if time.perf_counter() >= deadline:
+                break
+            index = self.object_ids.index(object_id)
+            match = self._search_lost(gray, object_id, self.trackers.boxes[index])
+            if match is None:
+                continue
+            if position and time.perf_counter() >= deadline:
+                # No budget left for the tracker init, start with this object
+                # next frame
+                self._reacquire_cursor = (start + position - 1) % len(lost)
+                break
+            box, score = match
+            if self.trackers.reinit(index, self._create_tracker(), tracking_frame, box):
+                del self.lost[object_id]
+                self.confidences[object_id] = score
+                self.reacquisitions += 1
+                self._reacquired(index, tracking_frame, box)
+                reacquired[object_id] = self._from_tracking(box)
+        return reacquired
+
+    def _reacquired(self, index, tracking_frame, box):
+        """Hook for trackers keeping more per-object state than the tracker
+        of self.trackers, called when object index was re-acquired at box"""
+
+    # Largest search window (in pixels) matched at full tracking resolution;
+    # larger windows are matched downscaled
+    REACQUIRE_MAX_PIXELS = 128 * 128
+
+    def _search_lost(self, gray, object_id, last_box):
+        # Template matching in a window around the last box that grows with
+        # the number of frames the object has been lost
+        template = self.reacquire_templates.get(object_id)
+        if template is None:
+            return None
+        th, tw = template.shape[:2]
+        x, y, w, h = last_box
+        margin = max(w, h) * (0.5 + self.search_growth * self.lost[object_id])
+        x0, y0 = max(int(x - margin), 0), max(int(y - margin), 0)
+        x1 = min(int(x + w + margin), gray.shape[1])
+        y1 = min(int(y + h + margin), gray.shape[0])
+        if x1 - x0 < tw or y1 - y0 < th:
+            return None
+
+        window = gray[y0:y1, x0:x1]
+        factor = min(1.0, (self.REACQUIRE_MAX_PIXELS / window.size) ** 0.5)
+        if factor < 1.0:
+            if min(tw, th) * factor < 4:
+                factor = 4 / min(tw, th)
+            window = cv2.resize(window, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+            template = cv2.resize(template, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+            if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+                return None
+
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        if not score >= self.reacquire_threshold:
+            return None
+        return (x0 + location[0] / factor, y0 + location[1] / factor, tw, th), float(score)
 
     def get_tracked_objects(self):
         return {
-            obj_id: bbox
+            obj_id: self._from_tracking(bbox)
             for obj_id, bbox in zip(self.object_ids, self.trackers.getObjects())
+            if obj_id not in self.lost
+        }
+
+    def close(self):
+        """Shut down the update thread pool, call when the run ends"""
+        self.trackers.close()
+
+    def get_scale_report(self):
+        """Speed/accuracy tradeoff of the resolution policy: the tracking scale,
+        the fraction of pixels processed, the box quantization error it adds
+        (in full resolution pixels) and the measured mean update time."""
+        return {
+            "scale": self.scale,
+            "pixel_fraction": self.scale ** 2,
+            "max_quantization_error_px": 0.5 / self.scale,
+            "updates": self._update_count,
+            "mean_update_ms": (
+                1000 * self._update_time / self._update_count if self._update_count else 0.0
+            ),
         }
 
+    def _auto_scale(self, bounding_boxes):
+        sides = [min(bbox[2], bbox[3]) for bbox in bounding_boxes if min(bbox[2], bbox[3]) > 0]
+        if not sides:
+            return 1.0
+        # Use 1/n factors: INTER_AREA has a fast path for integer downscaling
+        divisor = max(1, int(min(sides) // self.target_size))
+        return max(1.0 / divisor, self.MIN_SCALE)
+
+    def _resize(self, frame):
+        if self.scale == 1.0:
+            return frame
+        return cv2.resize(
+            frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA
+        )
+
+    def _to_tracking(self, bbox):
+        # Full resolution box -> box on the resized tracking frame
+        return tuple(float(v) * self.scale for v in bbox)
+
+    def _from_tracking(self, box):
+        # Box on the resized tracking frame -> integer full resolution box
+        return tuple(int(round(v / self.scale)) for v in box)
+
+    def _tracking_frame(self, frame):
+        # Frame objects (see data_io/frame.py) memoize the conversion and resize
+        # so other consumers of the same frame reuse them
+        if hasattr(frame, "scaled"):
+            return frame.scaled(self.scale)
+        return self._resize(to_bgr(frame))
+
+    def _tracking_gray(self, frame, tracking_frame):
+        if hasattr(frame, "scaled"):
+            return frame.scaled(self.scale, gray=True)
+        return cv2.cvtColor(tracking_frame, cv2.COLOR_BGR2GRAY)
+
     @staticmethod
-    def _ensure_bgr(frame):
-        if frame.dtype != np.uint8:
-            frame = (frame * 255).astype(np.uint8)
-        if len(frame.shape) == 2:
-            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-        elif frame.shape[2] == 4:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-        return frame
+    def _crop(image, box):
+        x, y, w, h = [int(round(v)) for v in box]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, image.shape[1]), min(y + h, image.shape[0])
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return image[y0:y1, x0:x1]
 
     def _create_tracker(self):
         # This method should be overridden by subclasses
@@ -0,0 +1,198 @@
+# trackers/cascade.py
+
+import time
+import cv2
+import numpy as np
+from .base import TrackingAlgorithmBase
+
+
+class CascadeTracker(TrackingAlgorithmBase):
+    """Fast tracker every frame, CSRT only when needed.
+
+    Every object is tracked by MOSSE (or KCF) on every frame and scored by the
+    similarity of its box to a slowly updated template of the object. CSRT
+    runs for an object only when that confidence drops below min_confidence
+    or every refine_interval frames, with the periodic refreshes spread so at
+    most one object is refreshed per frame. The better of the two boxes wins
+    and the fast tracker is re-seeded there, so CSRT corrects the drift of the
+    fast tracker at a fraction of its cost. CSRT keeps its own model between
+    runs and is only re-seeded when it loses an object the fast tracker still
+    follows, or when the object is re-acquired. MOSSE and KCF do not follow
+    scale, so the fast tracker only moves the box centre and the size comes
+    from the last CSRT result. Objects that stay below min_confidence are lost
+    and go through the re-acquisition of the base class.
+    """
+
+    FAST_TRACKERS = {"MOSSE": cv2.legacy.TrackerMOSSE_create, "KCF": cv2.legacy.TrackerKCF_create}
+    TEMPLATE_SIZE = (32, 32)
+
+    def __init__(
+        self,
+        fast="MOSSE",
+        refine_interval=5,
+        min_confidence=0.5,
+        template_rate=0.05,
+        **kwargs,
+    ):
+        if fast not in self.FAST_TRACKERS:
+            raise ValueError(f"Unknown fast tracker '{fast}', use one of {list(self.FAST_TRACKERS)}")
+        super().__init__(**kwargs)
+        self.fast_tracker_factory = self.FAST_TRACKERS[fast]
+        self.refine_interval = refine_interval
+        self.min_confidence = min_confidence
+        self.template_rate = template_rate
+
+        self.refiners = []  # CSRT tracker per object, in self.object_ids order
+        self.templates = []
+        self.sizes = []  # (w, h) of every object from its last CSRT result
+        self.refined_at = []  # Frame each CSRT tracker last ran
+        self.frame_count = 0
+        self.refinements = 0
+
+    def _create_tracker(self):
+        return self.fast_tracker_factory()
+
+    def _create_refiner(self):
+        return cv2.legacy.TrackerCSRT_create()
+
+    def _patch(self, gray, box):
+        crop = self._crop(gray, box)
+        if crop is None:
+            return None
+        return cv2.resize(crop, self.TEMPLATE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _similarity(self, patch, index):
+        # Normalized cross-correlation with the object's template, in [0, 1]
+        if patch is None:
+            return 0.0
+        score = float(cv2.matchTemplate(patch, self.templates[index], cv2.TM_CCOEFF_NORMED)[0, 0])
+        return max(score, 0.0) if np.isfinite(score) else 0.0
+
+    def _seed_new_objects(self, frame):
+        # Give the objects just added by the base class a CSRT tracker and a template
+        if len(self.refiners) == len(self.object_ids):
+            return
+        tracking_frame = self._tracking_frame(frame)
+        gray = self._tracking_gray(frame, tracking_frame)
+        for index in range(len(self.refiners), len(self.object_ids)):
+            box = self.trackers.boxes[index]
+            refiner = self._create_refiner()
+            refiner.init(tracking_frame, box)
+            self.refiners.append(refiner)
+            self.sizes.append(tuple(box[2:]))
+            self.refined_at.append(self.frame_count)
+            patch = self._patch(gray, box)
+            self.templates.append(
+                patch if patch is not None else np.zeros(self.TEMPLATE_SIZE[::-1], np.float32)
+            )
+            self.confidences[self.object_ids[index]] = 1.0
+
+    def initialize(self, frame, bounding_boxes):
+        success = super().initialize(frame, bounding_boxes)
+        self._seed_new_objects(frame)
+        return success
+
+    def add_object(self, frame, bounding_box):
+        success = super().add_object(frame, bounding_box)
+        self._seed_new_objects(frame)
+        return success
+
+    def remove_object(self, object_id):
+        if object_id in self.object_ids:
+            index = self.object_ids.index(object_id)
+            del self.refiners[index]
+            del self.templates[index]
+            del self.sizes[index]
+            del self.refined_at[index]
+            self.confidences.pop(object_id, None)
+        super().remove_object(object_id)
+
+    def update(self, frame):
+        start = time.perf_counter()
+        tracking_frame = self._tracking_frame(frame)
+        gray = self._tracking_gray(frame, tracking_frame)
+        self.trackers.update(tracking_frame)
+        self.frame_count += 1
+        refresh_index = self._refresh_index()
+
+        tracked_objects = {}
+        for index, object_id in enumerate(self.object_ids):
+            x, y, w, h = self.trackers.boxes[index]
+            size_w, size_h = self.sizes[index]
+            box = (x + (w - size_w) / 2, y + (h - size_h) / 2, size_w, size_h)
+            patch = self._patch(gray, box)
+            confidence = self._similarity(patch, index) if self.trackers.successes[index] else 0.0
+
+            refresh = index == refresh_index
+            if refresh or confidence < self.min_confidence:
+                box, patch, confidence = self._refine(
+                    index, tracking_frame, gray, box, patch, confidence, prefer_refined=refresh
+                )
+
+            self.confidences[object_id] = confidence
+            if confidence >= self.min_confidence:
+                self.lost.pop(object_id, None)
+                tracked_objects[object_id] = self._from_tracking(box)
+                # Follow slow appearance changes of confidently tracked objects
+                self.templates[index] += self.template_rate * (patch - self.templates[index])
+            else:
+                self.lost[object_id] = self.lost.get(object_id, 0) + 1
+
+        if self.lost:
+            tracked_objects.update(self.handle_disappearance(frame, tracking_frame))
+
+        self._update_time += time.perf_counter() - start
+        self._update_count += 1
+        return tracked_objects
+
+    def _refresh_index(self):
+        # The object refined longest ago, once that is refine_interval frames
+        # ago, so periodic refreshes of several objects fall on different frames
+        if not self.refine_interval or not self.refined_at:
+            return None
+        index = min(range(len(self.refined_at)), key=self.refined_at.__getitem__)
+        if self.frame_count - self.refined_at[index] < self.refine_interval:
+            return None
+        return index
+
+    def _refine(self, index, tracking_frame, gray, box, patch, confidence, prefer_refined=False):
+        # Run CSRT, keep the better box and re-seed the tracker that lost. On
+        # periodic refreshes CSRT, the more accurate tracker, wins whenever it
+        # is confident.
+        self.refinements += 1
+        self.refined_at[index] = self.frame_count
+        success, refined_box = self.refiners[index].update(tracking_frame)
+        refined_patch = self._patch(gray, refined_box) if success else None
+        refined_confidence = self._similarity(refined_patch, index)
+
+        if refined_confidence > confidence or (
+            prefer_refined and refined_confidence >= self.min_confidence
+        ):
+            self.trackers.reinit(index, self._create_tracker(), tracking_frame, refined_box)
+            self.sizes[index] = tuple(refined_box[2:])
+            return tuple(refined_box), refined_patch, refined_confidence
+        if confidence >= self.min_confidence > refined_confidence:
+            # CSRT lost the object, follow it again from the fast box. A CSRT
+            # that merely lags keeps its model, re-seeding it at the fast box
+            # would teach it the drift it is there to correct.
+            self._reseed_refiner(index, tracking_frame, box)
+        return box, patch, confidence
+
+    def _reseed_refiner(self, index, tracking_frame, box):
+        refiner = self._create_refiner()
+        refiner.init(tracking_frame, tuple(box))
+        self.refiners[index] = refiner
+
+    def _reacquired(self, index, tracking_frame, box):
+        self._reseed_refiner(index, tracking_frame, box)
+        self.sizes[index] = tuple(box[2:])
+        self.refined_at[index] = self.frame_count
+
+    def get_cascade_report(self):
+        """How often CSRT had to run: refinements per object and frame"""
+        object_frames = self.frame_count * max(len(self.object_ids), 1)
+        return {
+            "frames": self.frame_count,
+            "refinements": self.refinements,
+            "refinement_rate": self.refinements / object_frames if self.frame_count else 0.0,
+        }
@@ -1,16 +1,101 @@
 import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 from scipy.spatial import distance as dist
-from collections import OrderedDict
+from collections.abc import Mapping
 from .base import TrackingAlgorithmBase
 
 
+class TrackStore:
+    """Structure-of-arrays state of the tracked centroids.
+
+    Slots are preallocated and reused after an object expires, so a long
+    running session does not allocate per frame; the arrays only grow
+    (doubling) when more objects are alive than ever before.
+    """
+
+    def __init__(self, capacity=64):
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.centroids = np.zeros((capacity, 2), dtype=np.int64)
+        self.disappeared = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.slot_of = {}  # object id -> slot, changes only on add/remove
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def active_slots(self):
+        return np.flatnonzero(self.alive)
+
+    def add(self, ids, centroids):
+        free = np.flatnonzero(~self.alive)
+        if len(free) < len(ids):
+            self._grow(len(self.alive) - len(free) + len(ids))
+            free = np.flatnonzero(~self.alive)
+        slots = free[:len(ids)]
+        self.ids[slots] = ids
+        self.centroids[slots] = centroids
+        self.disappeared[slots] = 0
+        self.alive[slots] = True
+        self.slot_of.update(zip(ids.tolist(), slots.tolist()))
+        return slots
+
+    def remove(self, slots):
+        self.alive[slots] = False
+        for object_id in self.ids[slots].tolist():
+            del self.slot_of[object_id]
+        self.ids[slots] = -1
+
+    def _grow(self, required):
+        capacity = len(self.alive)
+        while capacity < required:
+            capacity *= 2
+        extra = capacity - len(self.alive)
+        self.ids = np.concatenate([self.ids, np.full(extra, -1, dtype=np.int64)])
+        self.centroids = np.concatenate([self.centroids, np.zeros((extra, 2), dtype=np.int64)])
+        self.disappeared = np.concatenate([self.disappeared, np.zeros(extra, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+
+
+class _TrackView(Mapping):
+    # Read-only {object_id: value} view of one TrackStore column, in id order
+    def __init__(self, store, column, convert):
+        self._store = store
+        self._column = column
+        self._convert = convert
+
+    def __getitem__(self, object_id):
+        slot = self._store.slot_of[object_id]
+        return self._convert(getattr(self._store, self._column)[slot])
+
+    def __iter__(self):
+        return iter(sorted(self._store.slot_of))
+
+    def __len__(self):
+        return len(self._store)
+
+
 class CentroidTracker(TrackingAlgorithmBase):
-    def __init__(self, max_disappeared=50):
-        super().__init__()
+    # Assignment strategies for matching tracked objects to new centroids
+    OPTIMAL = "optimal"  # Minimum total distance (Hungarian algorithm per gated cluster)
+    GREEDY = "greedy"  # Closest pairs first, fastest
+
+    def __init__(self, max_disappeared=50, max_distance=None, assignment=OPTIMAL, **kwargs):
+        super().__init__(**kwargs)
+        if assignment not in (self.OPTIMAL, self.GREEDY):
+            raise ValueError(f"Unknown assignment '{assignment}'")
         self.nextObjectID = 0
-        self.objects = OrderedDict()
-        self.disappeared = OrderedDict()
+        self.tracks = TrackStore()
+        # Dict-like views kept for compatibility with the previous OrderedDict state
+        self.objects = _TrackView(self.tracks, "centroids", lambda c: (int(c[0]), int(c[1])))
+        self.disappeared = _TrackView(self.tracks, "disappeared", int)
         self.maxDisappeared = max_disappeared
+        # Pairs further apart than max_distance are never matched; with a gate
+        # only nearby pairs found through a KD-tree are scored
+        self.maxDistance = max_distance
+        self.assignment = assignment
 
     def _create_tracker(self):
         # Not used in Centroid Tracker
@@ -24,63 +109,142 @@ class CentroidTracker(TrackingAlgorithmBase):
     def add_object(self, frame, bounding_box):
         x, y, w, h = bounding_box
         centroid = (int(x + w / 2), int(y + h / 2))
-        self.objects[self.nextObjectID] = centroid
-        self.disappeared[self.nextObjectID] = 0
-        self.nextObjectID += 1
+        self._register(np.array([centroid]))
+
+    def _register(self, centroids):
+        ids = np.arange(self.nextObjectID, self.nextObjectID + len(centroids))
+        self.nextObjectID += len(centroids)
+        self.tracks.add(ids, centroids)
+
+    def remove_object(self, object_id):
+        slot = self.tracks.slot_of.get(object_id)
+        if slot is not None:
+            self.tracks.remove(np.array([slot]))
 
     def update(self, frame):
         # This method should be called with detected objects
         # For simplicity, we'll just return the current objects
         return {obj_id: (x - 2, y - 2, 4, 4) for obj_id, (x, y) in self.objects.items()}
 
+    def _age(self, slots):
+        tracks = self.tracks
+        tracks.disappeared[slots] += 1
+        tracks.remove(slots[tracks.disappeared[slots] > self.maxDisappeared])
+
     def update_centroids(self, centroids):
+        slots = self.tracks.active_slots()
         if len(centroids) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.maxDisappeared:
-                    self.remove_object(object_id)
+            self._age(slots)
             return self.objects
 
-        input_centroids = np.zeros((len(centroids), 2), dtype="int")
-        for i, (x, y) in enumerate(centroids):
-            input_centroids[i] = (x, y)
-
-        if len(self.objects) == 0:
-            for i in range(0, len(input_centroids)):
-                self.add_object(None, (*input_centroids[i], 0, 0))
-        else:
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
+        input_centroids = np.asarray(centroids, dtype=np.int64).reshape(-1, 2)
 
-            D = dist.cdist(np.array(object_centroids), input_centroids)
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
-
-            used_rows = set()
-            used_cols = set()
-
-            for row, col in zip(rows, cols):
-                if row in used_rows or col in used_cols:
-                    continue
-
-                object_id = object_ids[row]
-                self.objects[object_id] = input_centroids[col]
-                self.disappeared[object_id] = 0
-
-                used_rows.add(row)
-                used_cols.add(col)
+        if len(slots) == 0:
+            self._register(input_centroids)
+            return self.objects
 
-            unused_rows = set(range(0, D.shape[0])).difference(used_rows)
-            unused_cols = set(range(0, D.shape[1])).difference(used_cols)
+        rows, cols = self.match(self.tracks.centroids[slots], input_centroids)
+        matched = slots[rows]
+        self.tracks.centroids[matched] = input_centroids[cols]
+        self.tracks.disappeared[matched] = 0
 
-            if D.shape[0] >= D.shape[1]:
-                for row in unused_rows:
-                    object_id = object_ids[row]
-                    self.disappeared[object_id] += 1
-                    if self.disappeared[object_id] > self.maxDisappeared:
-                        self.remove_object(object_id)
-            else:
-                for col in unused_cols:
-                    self.add_object(None, (*input_centroids[col], 0, 0))
+        unused_rows = np.ones(len(slots), dtype=bool)
+        unused_rows[rows] = False
+        unused_cols = np.ones(len(input_centroids), dtype=bool)
+        unused_cols[cols] = False
 
+        self._age(slots[unused_rows])
+        self._register(input_centroids[unused_cols])
         return self.objects
+
+    def match(self, object_centroids, input_centroids):
+        """Match tracked centroids (rows) to new centroids (cols), returns (rows, cols)"""
+        if self.maxDistance is None and self.assignment == self.GREEDY:
+            return self._match_greedy_dense(object_centroids, input_centroids)
+
+        rows, cols, distances = self._candidate_pairs(object_centroids, input_centroids)
+        if len(distances) == 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        if self.assignment == self.GREEDY:
+            return self._match_greedy(rows, cols, distances)
+        return self._match_optimal(rows, cols, distances, len(object_centroids), len(input_centroids))
+
+    def _candidate_pairs(self, object_centroids, input_centroids):
+        if self.maxDistance is None:
+            D = dist.cdist(object_centroids, input_centroids)
+            rows, cols = np.indices(D.shape)
+            return rows.ravel(), cols.ravel(), D.ravel()
+
+        pairs = cKDTree(object_centroids).sparse_distance_matrix(
+            cKDTree(input_centroids), self.maxDistance, output_type="ndarray"
+        )
+        return pairs["i"], pairs["j"], pairs["v"]
+
+    @staticmethod
+    def _match_greedy_dense(object_centroids, input_centroids):
+        # Rows in order of their closest distance each take their closest column
+        D = dist.cdist(object_centroids, input_centroids)
+        rows = D.min(axis=1).argsort()
+        cols = D.argmin(axis=1)[rows]
+
+        used_cols = np.zeros(D.shape[1], dtype=bool)
+        keep = np.zeros(len(rows), dtype=bool)
+        for k, col in enumerate(cols):
+            if not used_cols[col]:
+                used_cols[col] = keep[k] = True
+        return rows[keep], cols[keep]
+
+    @staticmethod
+    def _match_greedy(rows, cols, distances):
+        # Closest candidate pairs first
+        used_rows = np.zeros(rows.max() + 1, dtype=bool)
+        used_cols = np.zeros(cols.max() + 1, dtype=bool)
+        remaining = min(len(np.unique(rows)), len(np.unique(cols)))
+        matched_rows, matched_cols = [], []
+        for k in np.argsort(distances, kind="stable"):
+            row, col = rows[k], cols[k]
+            if used_rows[row] or used_cols[col]:
+                continue
+            used_rows[row] = used_cols[col] = True
+            matched_rows.append(row)
+            matched_cols.append(col)
+            remaining -= 1
+            if remaining == 0:
+                break
+        return np.array(matched_rows, dtype=int), np.array(matched_cols, dtype=int)
+
+    @staticmethod
+    def _match_optimal(rows, cols, distances, n_rows, n_cols):
+        # Pairs whose row and column have no other candidate are matched directly
+        isolated = (np.bincount(rows, minlength=n_rows)[rows] == 1) & (
+            np.bincount(cols, minlength=n_cols)[cols] == 1
+        )
+        matched_rows, matched_cols = [rows[isolated]], [cols[isolated]]
+        rows, cols, distances = rows[~isolated], cols[~isolated], distances[~isolated]
+        if len(rows) == 0:
+            return matched_rows[0], matched_cols[0]
+
+        # Only candidate pairs can be matched, so the rest of the assignment
+        # splits into independent clusters of the rows/cols graph; solve each
+        # densely.
+        graph = coo_matrix(
+            (np.ones(len(rows)), (rows, n_rows + cols)), shape=(n_rows + n_cols,) * 2
+        )
+        _, labels = connected_components(graph, directed=False)
+        pair_labels = labels[rows]
+        order = np.argsort(pair_labels, kind="stable")
+        boundaries = np.flatnonzero(np.diff(pair_labels[order])) + 1
+
+        for cluster in np.split(order, boundaries):
+            cluster_rows, row_index = np.unique(rows[cluster], return_inverse=True)
+            cluster_cols, col_index = np.unique(cols[cluster], return_inverse=True)
+            # Non-candidate pairs cost more than any set of candidate pairs, so
+            # the solver maximizes the number of matches before the distance
+            infeasible = distances[cluster].sum() + 1.0
+            cost = np.full((len(cluster_rows), len(cluster_cols)), infeasible)
+            cost[row_index, col_index] = distances[cluster]
+            r, c = linear_sum_assignment(cost)
+            feasible = cost[r, c] < infeasible
+            matched_rows.append(cluster_rows[r[feasible]])
+            matched_cols.append(cluster_cols[c[feasible]])
+        return np.concatenate(matched_rows), np.concatenate(matched_cols)
@@ -0,0 +1,78 @@
+# trackers/multi_tracker.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ParallelMultiTracker:
+    """Replacement for cv2.legacy.MultiTracker that keeps one independent tracker
+    per object and updates them concurrently on a thread pool. OpenCV releases
+    the GIL inside tracker updates, so the objects are tracked on separate cores.
+
+    Implements the add/update/getObjects interface of cv2.legacy.MultiTracker,
+    plus per-object results (self.successes) and object removal.
+    """
+
+    def __init__(self, workers=0):
+        # workers: thread count, 0 for one per CPU, 1 for serial updates
+        self.workers = workers or os.cpu_count() or 1
+        self.trackers = []
+        self.boxes = []
+        self.successes = []
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="tracker"
+            )
+
+    def add(self, tracker, image, bounding_box):
+        bounding_box = tuple(bounding_box)
+        success = tracker.init(image, bounding_box)
+        # Legacy trackers return None from init in some OpenCV versions
+        if success is None or success:
+            self.trackers.append(tracker)
+            self.boxes.append(bounding_box)
+            self.successes.append(True)
+            return True
+        return False
+
+    def update(self, image):
+        if self._executor is not None and len(self.trackers) > 1:
+            results = list(self._executor.map(lambda t: t.update(image), self.trackers))
+        else:
+            results = [tracker.update(image) for tracker in self.trackers]
+
+        for i, (success, box) in enumerate(results):
+            self.successes[i] = bool(success)
+            if success:
+                self.boxes[i] = tuple(box)
+
+        # Like cv2.legacy.MultiTracker, overall success means every object was found
+        return all(self.successes), tuple(self.boxes)
+
+    def reinit(self, index, tracker, image, bounding_box):
+        """Replace the tracker of one object with a new one seeded at bounding_box"""
+        bounding_box = tuple(bounding_box)
+        success = tracker.init(image, bounding_box)
+        if success is None or success:
+            self.trackers[index] = tracker
+            self.boxes[index] = bounding_box
+            self.successes[index] = True
+            return True
+        return False
+
+    def getObjects(self):
+        return tuple(self.boxes)
+
+    def remove(self, index):
+        del self.trackers[index]
+        del self.boxes[index]
+        del self.successes[index]
+
+    def __len__(self):
+        return len(self.trackers)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
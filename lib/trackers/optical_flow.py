@@ -1,12 +1,55 @@
 import cv2
 import numpy as np
-from .base import TrackingAlgorithmBase
+from .base import TrackingAlgorithmBase, to_bgr
+
+
+def _group_median(values, groups, n_groups):
+    # Median of values per group id, NaN for empty groups
+    medians = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return medians
+    order = np.lexsort((values, groups))
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    present = counts > 0
+    low = order[starts[present] + (counts[present] - 1) // 2]
+    high = order[starts[present] + counts[present] // 2]
+    medians[present] = (values[low] + values[high]) / 2
+    return medians
+
 
 class OpticalFlowTracker(TrackingAlgorithmBase):
-    def __init__(self):
-        super().__init__()
+    """Sparse Lucas-Kanade tracker.
+
+    Every object is tracked through a set of good features inside its box. The
+    points of all objects go through one forward and one backward LK call per
+    frame, points failing the forward-backward check are dropped, and each box
+    moves by the median displacement and scales by the median change of the
+    point spread (as in MedianFlow). The grayscale frame is converted once and
+    kept as the previous image for the next frame.
+    """
+
+    def __init__(
+        self,
+        win_size=(21, 21),
+        max_level=3,
+        max_points=50,
+        min_points=4,
+        fb_threshold=1.0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.win_size = tuple(win_size)
+        self.max_level = max_level
+        self.max_points = max_points
+        self.min_points = min_points
+        self.fb_threshold = fb_threshold
+
         self.prev_gray = None
-        self.prev_points = None
+        self.prev_points = np.zeros((0, 1, 2), dtype=np.float32)
+        self.point_owner = np.zeros(0, dtype=np.int64)  # Index into self.boxes
+        self.point_target = np.zeros(0, dtype=np.int64)  # Points found at last detection
+        self.boxes = np.zeros((0, 4), dtype=np.float64)
         self.object_ids = []
         self.next_object_id = 0
 
@@ -14,47 +57,142 @@ class OpticalFlowTracker(TrackingAlgorithmBase):
         # Not used in Optical Flow Tracker
         pass
 
+    @staticmethod
+    def _gray(frame):
+        if hasattr(frame, "gray"):
+            return frame.gray
+        if len(frame.shape) == 2:
+            return frame
+        return cv2.cvtColor(to_bgr(frame), cv2.COLOR_BGR2GRAY)
+
+    def _detect_points(self, gray, box):
+        x, y, w, h = [int(round(v)) for v in box]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, gray.shape[1]), min(y + h, gray.shape[0])
+        points = None
+        if x1 - x0 > 2 and y1 - y0 > 2:
+            points = cv2.goodFeaturesToTrack(
+                gray[y0:y1, x0:x1], self.max_points, qualityLevel=0.01, minDistance=3
+            )
+        if points is None or len(points) < self.min_points:
+            # Textureless box: fall back to a regular grid
+            side = max(2, int(np.sqrt(self.max_points)))
+            gx, gy = np.meshgrid(
+                np.linspace(x + w * 0.1, x + w * 0.9, side),
+                np.linspace(y + h * 0.1, y + h * 0.9, side),
+            )
+            return np.stack([gx.ravel(), gy.ravel()], axis=1).astype(np.float32).reshape(-1, 1, 2)
+        return (points.reshape(-1, 2) + (x0, y0)).astype(np.float32).reshape(-1, 1, 2)
+
     def initialize(self, frame, bounding_boxes):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = self._gray(frame)
         self.prev_gray = gray
-        self.prev_points = np.array([[(box[0] + box[2]/2, box[1] + box[3]/2)] for box in bounding_boxes], dtype=np.float32)
-        self.object_ids = list(range(len(bounding_boxes)))
-        self.next_object_id = len(bounding_boxes)
+        for box in bounding_boxes:
+            self._add(gray, box)
+        return len(self.object_ids) > 0
+
+    def _add(self, gray, bounding_box):
+        index = len(self.boxes)
+        points = self._detect_points(gray, bounding_box)
+        self.boxes = np.vstack([self.boxes, np.asarray(bounding_box, dtype=np.float64)[None]])
+        self.prev_points = np.concatenate([self.prev_points, points])
+        self.point_owner = np.concatenate([self.point_owner, np.full(len(points), index)])
+        self.point_target = np.append(self.point_target, len(points))
+        self.object_ids.append(self.next_object_id)
+        self.next_object_id += 1
+
+    def add_object(self, frame, bounding_box):
+        gray = self._gray(frame) if frame is not None else self.prev_gray
+        if gray is None:
+            return False
+        self._add(gray, bounding_box)
         return True
 
+    def remove_object(self, object_id):
+        if object_id in self.object_ids:
+            self._keep_objects(np.array([oid != object_id for oid in self.object_ids]))
+
+    def _keep_objects(self, keep):
+        # Drop objects (and their points) where keep is False, renumbering owners
+        new_index = np.cumsum(keep) - 1
+        point_keep = keep[self.point_owner]
+        self.prev_points = self.prev_points[point_keep]
+        self.point_owner = new_index[self.point_owner[point_keep]]
+        self.boxes = self.boxes[keep]
+        self.point_target = self.point_target[keep]
+        self.object_ids = [oid for oid, k in zip(self.object_ids, keep) if k]
+
     def update(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
+        gray = self._gray(frame)
+
         if self.prev_gray is None or len(self.prev_points) == 0:
             self.prev_gray = gray
             return {}
 
-        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.prev_points, None)
-        
-        good_new = new_points[status == 1]
-        good_old = self.prev_points[status == 1]
+        # One forward and one backward pass for the points of every object
+        lk = dict(winSize=self.win_size, maxLevel=self.max_level)
+        p0 = self.prev_points
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, p0, None, **lk)
+        p0r, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, p1, None, **lk)
+        fb_error = np.linalg.norm((p0 - p0r).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < self.fb_threshold)
 
-        tracked_objects = {}
-        for i, (new, old) in enumerate(zip(good_new, good_old)):
-            x, y = new.ravel()
-            tracked_objects[self.object_ids[i]] = (int(x - 2), int(y - 2), 4, 4)  # Small bounding box around the point
+        n_objects = len(self.boxes)
+        owner = self.point_owner[good]
+        old = p0.reshape(-1, 2)[good].astype(np.float64)
+        new = p1.reshape(-1, 2)[good].astype(np.float64)
+        counts = np.bincount(owner, minlength=n_objects)
 
-        self.prev_gray = gray
-        self.prev_points = good_new.reshape(-1, 1, 2)
-        self.object_ids = [self.object_ids[i] for i in range(len(self.object_ids)) if status[i] == 1]
+        # Box translation: median point displacement per object
+        dx = _group_median(new[:, 0] - old[:, 0], owner, n_objects)
+        dy = _group_median(new[:, 1] - old[:, 1], owner, n_objects)
 
-        return tracked_objects
+        # Box scale: median ratio of point distances to the object's point centre
+        safe_counts = np.maximum(counts, 1)
+        centre_old = np.stack(
+            [np.bincount(owner, old[:, k], n_objects) / safe_counts for k in range(2)], axis=1
+        )
+        centre_new = np.stack(
+            [np.bincount(owner, new[:, k], n_objects) / safe_counts for k in range(2)], axis=1
+        )
+        spread_old = np.linalg.norm(old - centre_old[owner], axis=1)
+        spread_new = np.linalg.norm(new - centre_new[owner], axis=1)
+        valid = spread_old > 1e-3
+        scale = _group_median(
+            spread_new[valid] / spread_old[valid], owner[valid], n_objects
+        )
+        scale = np.where(np.isnan(scale), 1.0, scale)
 
-    def add_object(self, frame, bounding_box):
-        x, y, w, h = bounding_box
-        new_point = np.array([[x + w/2, y + h/2]], dtype=np.float32)
-        self.prev_points = np.vstack((self.prev_points, new_point)) if self.prev_points is not None else new_point
-        self.object_ids.append(self.next_object_id)
-        self.next_object_id += 1
-        return True
+        alive = counts >= self.min_points
+        boxes = self.boxes
+        cx = boxes[:, 0] + boxes[:, 2] / 2 + np.nan_to_num(dx)
+        cy = boxes[:, 1] + boxes[:, 3] / 2 + np.nan_to_num(dy)
+        w, h = boxes[:, 2] * scale, boxes[:, 3] * scale
+        self.boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
 
-    def remove_object(self, object_id):
-        if object_id in self.object_ids:
-            index = self.object_ids.index(object_id)
-            self.object_ids.pop(index)
-            self.prev_points = np.delete(self.prev_points, index, axis=0)
+        self.prev_points = p1[good]
+        self.point_owner = owner
+        self._keep_objects(alive)
+
+        # Redetect the points of objects that lost more than half of them
+        counts = np.bincount(self.point_owner, minlength=len(self.boxes))
+        stale = np.flatnonzero(counts < self.point_target // 2)
+        if len(stale):
+            keep = ~np.isin(self.point_owner, stale)
+            points, owners = [self.prev_points[keep]], [self.point_owner[keep]]
+            for index in stale:
+                detected = self._detect_points(gray, self.boxes[index])
+                points.append(detected)
+                owners.append(np.full(len(detected), index))
+                self.point_target[index] = len(detected)
+            self.prev_points = np.concatenate(points)
+            self.point_owner = np.concatenate(owners)
+
+        self.prev_gray = gray
+        return self.get_tracked_objects()
+
+    def get_tracked_objects(self):
+        return {
+            object_id: tuple(int(round(v)) for v in box)
+            for object_id, box in zip(self.object_ids, self.boxes)
+        }
@@ -0,0 +1,176 @@
+# trackers/sort.py
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from .base import TrackingAlgorithmBase
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of (N, 4) and (M, 4) arrays of (x, y, w, h) boxes"""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    x1 = np.maximum(a[..., 0], b[..., 0])
+    y1 = np.maximum(a[..., 1], b[..., 1])
+    x2 = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+    y2 = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+
+class SORTTracker(TrackingAlgorithmBase):
+    """Detection-driven multi-object tracker (SORT): a constant velocity Kalman
+    filter per track, associated to detections by IoU.
+
+    The state of all tracks is kept in batched arrays, so prediction and
+    correction are single matrix operations over every track. Feed detections
+    with update_detections(); update(frame) only predicts, which keeps tracks
+    alive through frames without detections.
+    """
+
+    # State: centre x, centre y, area, aspect ratio, and velocities of the first three
+    DIM_X = 7
+    DIM_Z = 4
+
+    def __init__(self, max_age=5, min_hits=1, iou_threshold=0.3, **kwargs):
+        super().__init__(**kwargs)
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+
+        self.F = np.eye(self.DIM_X)
+        self.F[0, 4] = self.F[1, 5] = self.F[2, 6] = 1.0
+        self.H = np.eye(self.DIM_Z, self.DIM_X)
+        self.Q = np.eye(self.DIM_X)
+        self.Q[-1, -1] *= 0.01
+        self.Q[4:, 4:] *= 0.01
+        self.R = np.eye(self.DIM_Z)
+        self.R[2:, 2:] *= 10.0
+        self.P0 = np.eye(self.DIM_X) * 10.0
+        self.P0[4:, 4:] *= 1000.0  # High uncertainty for the unobserved velocities
+
+        self.x = np.zeros((0, self.DIM_X))
+        self.P = np.zeros((0, self.DIM_X, self.DIM_X))
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.time_since_update = np.zeros(0, dtype=np.int64)
+        self.frame_count = 0
+
+    def _create_tracker(self):
+        # Not used in SORT Tracker
+        pass
+
+    @staticmethod
+    def _to_measurement(boxes):
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        w, h = boxes[:, 2], boxes[:, 3]
+        return np.stack(
+            [boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / np.maximum(h, 1e-6)], axis=1
+        )
+
+    @staticmethod
+    def _to_boxes(x):
+        w = np.sqrt(np.clip(x[:, 2] * x[:, 3], 0, None))
+        h = np.where(w > 0, x[:, 2] / np.maximum(w, 1e-6), 0)
+        return np.stack([x[:, 0] - w / 2, x[:, 1] - h / 2, w, h], axis=1)
+
+    def initialize(self, frame, bounding_boxes):
+        self._add_tracks(bounding_boxes)
+        return len(bounding_boxes) > 0
+
+    def add_object(self, frame, bounding_box):
+        self._add_tracks([bounding_box])
+        return True
+
+    def _add_tracks(self, boxes):
+        z = self._to_measurement(boxes)
+        n = len(z)
+        x = np.zeros((n, self.DIM_X))
+        x[:, :self.DIM_Z] = z
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.broadcast_to(self.P0, (n, self.DIM_X, self.DIM_X))])
+        self.track_ids = np.concatenate(
+            [self.track_ids, np.arange(self.next_object_id, self.next_object_id + n)]
+        )
+        self.next_object_id += n
+        self.object_ids = self.track_ids.tolist()
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+        self.time_since_update = np.concatenate([self.time_since_update, np.zeros(n, dtype=np.int64)])
+
+    def _keep(self, mask):
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.track_ids = self.track_ids[mask]
+        self.hits = self.hits[mask]
+        self.time_since_update = self.time_since_update[mask]
+        self.object_ids = self.track_ids.tolist()
+
+    def remove_object(self, object_id):
+        self._keep(self.track_ids != object_id)
+
+    def predict(self):
+        # Area must stay positive
+        shrinking = self.x[:, 2] + self.x[:, 6] <= 0
+        self.x[shrinking, 6] = 0.0
+        self.x = self.x @ self.F.T
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        self.time_since_update += 1
+        self.frame_count += 1
+
+    def _correct(self, indices, z):
+        # Batched Kalman update of the tracks at indices with measurements z
+        x, P = self.x[indices], self.P[indices]
+        y = z - x @ self.H.T
+        S = self.H @ P @ self.H.T + self.R
+        PHt = P @ self.H.T
+        K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)
+        self.x[indices] = x + np.einsum("nij,nj->ni", K, y)
+        self.P[indices] = (np.eye(self.DIM_X) - K @ self.H) @ P
+        self.hits[indices] += 1
+        self.time_since_update[indices] = 0
+
+    def associate(self, detections):
+        """Match predicted tracks to detections by IoU, returns (tracks, detections)"""
+        if len(self.x) == 0 or len(detections) == 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        iou = iou_matrix(self._to_boxes(self.x), detections)
+        rows, cols = linear_sum_assignment(-iou)
+        keep = iou[rows, cols] >= self.iou_threshold
+        return rows[keep], cols[keep]
+
+    def update_detections(self, detections):
+        """Advance one frame with (x, y, w, h) detections, returns {object_id: bbox}
+        for the tracks matched in this frame"""
+        detections = np.asarray(detections, dtype=float).reshape(-1, 4)
+        self.predict()
+
+        tracks, matched = self.associate(detections)
+        if len(tracks):
+            self._correct(tracks, self._to_measurement(detections[matched]))
+
+        unmatched = np.ones(len(detections), dtype=bool)
+        unmatched[matched] = False
+        self._keep(self.time_since_update <= self.max_age)
+        if unmatched.any():
+            self._add_tracks(detections[unmatched])
+
+        confirmed = (self.time_since_update == 0) & (
+            (self.hits >= self.min_hits) | (self.frame_count <= self.min_hits)
+        )
+        return self._as_dict(confirmed)
+
+    def update(self, frame):
+        # No detections: coast every track on its motion model
+        self.predict()
+        self._keep(self.time_since_update <= self.max_age)
+        return self._as_dict(np.ones(len(self.x), dtype=bool))
+
+    def get_tracked_objects(self):
+        return self._as_dict(np.ones(len(self.x), dtype=bool))
+
+    def _as_dict(self, mask):
+        boxes = self._to_boxes(self.x[mask])
+        return {
+            int(object_id): tuple(int(round(v)) for v in box)
+            for object_id, box in zip(self.track_ids[mask], boxes)
+        }
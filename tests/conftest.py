@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The code imports data_io, trackers and profiling as top-level packages,
+# as when classic_CV/main.py runs with lib on the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, "lib"), os.path.join(ROOT, "classic_CV")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
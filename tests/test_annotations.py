@@ -0,0 +1,54 @@
+import io
+import numpy as np
+import pytest
+from data_io.annotations import AnnotationIndex, AnnotationWriter
+from data_io.data_format import DataFormat
+
+
+class _Stream(io.BytesIO):
+    # Keeps the written bytes when the writer closes it
+    def close(self):
+        self.data = self.getvalue()
+        super().close()
+
+
+def write_v2(annotated_frames, frames):
+    stream = _Stream()
+    writer = AnnotationWriter(stream, 2)
+    for i in range(frames):
+        annotations = [{"bbox": (i, 2, 3, 4), "confidence": 0.5}] if i in annotated_frames else []
+        writer.write_frame(i, annotations)
+    records_end = DataFormat.ANNOTATION_V2_HEADER.size + writer.record_count * _record_size()
+    writer.close()
+    return stream.data, records_end
+
+
+def _record_size():
+    return DataFormat.ANNOTATION_DTYPE.itemsize
+
+
+@pytest.mark.parametrize(
+    "annotated_frames, frames",
+    [
+        ({0}, 100),  # Trailing frames without annotations
+        (set(range(50)), 50),
+        ({3, 4, 40}, 60),
+    ],
+)
+def test_v2_without_complete_footer_keeps_only_records(annotated_frames, frames):
+    data, records_end = write_v2(annotated_frames, frames)
+    complete = AnnotationIndex.from_bytes(data, 2)
+    assert len(complete.records) == len(annotated_frames)
+
+    # close() interrupted anywhere after the records: end marker, index or footer
+    for end in range(records_end, len(data)):
+        index = AnnotationIndex.from_bytes(data[:end], 2)
+        assert np.array_equal(index.records, complete.records), end
+        assert index.truncated == (end != records_end)
+
+
+def test_v2_truncated_record_is_dropped():
+    data, records_end = write_v2({0, 1, 2}, 3)
+    index = AnnotationIndex.from_bytes(data[:records_end - 1], 2)
+    assert len(index.records) == 2
+    assert index.truncated
@@ -0,0 +1,48 @@
+import os
+import threading
+import numpy as np
+from data_io.handlers import OutputHandler
+import main
+
+
+def record_archive(path, frames=12, size=(160, 120), boxes=((40, 30, 24, 24),)):
+    # Bright squares moving over a dark background
+    handler = OutputHandler(path, 30, size)
+    for i in range(frames):
+        image = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        annotations = []
+        for box in boxes:
+            x, y, w, h = box[0] + 2 * i, box[1] + i, box[2], box[3]
+            image[y:y + h, x:x + w] = 255
+            annotations.append({"bbox": (x, y, w, h), "confidence": 1.0})
+        if i == 0:
+            handler.set_roi(image, boxes[0] if len(boxes) == 1 else list(boxes))
+        handler.write_frame(image, annotations)
+    handler.finalize()
+
+
+def test_retrack_directory_with_headless_config(tmp_path):
+    input_dir = tmp_path / "recordings"
+    input_dir.mkdir()
+    record_archive(str(input_dir / "a.zip"))
+    output_dir = tmp_path / "retracked"
+
+    # headless only concerns live runs, archives bring their own ROI
+    config = {"headless": True, "tracking_algorithm": "KCFTracker"}
+    results = main.process_archive_directory(config, str(input_dir), str(output_dir), workers=1)
+
+    assert [r["success"] for r in results] == [True]
+    assert results[0]["frames"] == 12
+    assert os.path.exists(output_dir / "a.zip")
+
+
+def test_retrack_shuts_down_tracker_threads(tmp_path):
+    path = str(tmp_path / "a.zip")
+    # Two objects, so the updates actually run on the tracker thread pool
+    record_archive(path, boxes=((10, 10, 20, 20), (90, 60, 20, 20)))
+    config = {"tracking_algorithm": "KCFTracker", "tracker_options": {"workers": 2}}
+
+    before = threading.active_count()
+    for _ in range(3):
+        assert main.process_archive(config, path, None)["success"]
+    assert threading.active_count() == before